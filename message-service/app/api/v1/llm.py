@@ -1,11 +1,17 @@
 """LLM processing API endpoints."""
 
-from typing import Dict, Any, Optional
-from fastapi import APIRouter, HTTPException, Header, Query, Path
+import asyncio
+import time
+from typing import Dict, Any, Optional, Tuple
+from fastapi import APIRouter, HTTPException, Header, Query, Path, Request
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel, Field
 import httpx
+import orjson
+from pydantic_core import to_json
 
-from app.services.message_service import MessageService
+from app.services.message_service import message_service
+from app.models.auth import auth_client, auth_user_decoder
 from app.models.message import CreateMessageRequest, MessageResponse
 from app.core.rate_limiter import rate_limiter
 from app.core.exceptions import (
@@ -21,6 +27,10 @@ from app.core.config import settings
 logger = get_logger(__name__)
 router = APIRouter(prefix="/llm", tags=["LLM Processing"])
 
+# Serialized body of the last LLM health check, shared by all pollers until it expires
+_health_cache: Optional[Tuple[float, bytes]] = None
+_health_lock = asyncio.Lock()
+
 
 class LLMProcessRequest(BaseModel):
     """Request for LLM processing."""
@@ -56,28 +66,26 @@ async def get_user_id_from_token(authorization: str = Header(None)) -> str:
     
     try:
         # Call auth service to validate token
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{settings.auth_service_url}/api/v1/auth/validate",
-                headers={"Authorization": authorization},
-                timeout=10.0
-            )
-            
-            if response.status_code == 200:
-                user_data = response.json()
-                user_id = user_data.get("username") or user_data.get("id") or user_data.get("user_id") or user_data.get("sub")
-                if user_id:
-                    return user_id
-                else:
-                    logger.error("No user_id found in auth response", response=user_data)
-                    raise HTTPException(status_code=401, detail="Invalid token: no user ID")
-            elif response.status_code == 401:
-                logger.warning("Token validation failed", status=response.status_code)
-                raise HTTPException(status_code=401, detail="Invalid or expired token")
+        response = await auth_client.get(
+            f"{settings.auth_service_url}/api/v1/auth/validate",
+            headers={"Authorization": authorization},
+            timeout=10.0
+        )
+        
+        if response.status_code == 200:
+            user_id = auth_user_decoder.decode(response.content).resolved_user_id
+            if user_id:
+                return user_id
             else:
-                logger.error("Auth service error", status=response.status_code, response=response.text)
-                raise HTTPException(status_code=503, detail="Authentication service unavailable")
-                
+                logger.error("No user_id found in auth response", response=response.text)
+                raise HTTPException(status_code=401, detail="Invalid token: no user ID")
+        elif response.status_code == 401:
+            logger.warning("Token validation failed", status=response.status_code)
+            raise HTTPException(status_code=401, detail="Invalid or expired token")
+        else:
+            logger.error("Auth service error", status=response.status_code, response=response.text)
+            raise HTTPException(status_code=503, detail="Authentication service unavailable")
+            
     except httpx.TimeoutException:
         logger.error("Auth service timeout")
         raise HTTPException(status_code=503, detail="Authentication service timeout")
@@ -91,12 +99,16 @@ async def get_user_id_from_token(authorization: str = Header(None)) -> str:
         raise HTTPException(status_code=500, detail="Authentication error")
 
 
-@router.post("/process", response_model=LLMProcessResponse)
+@router.post(
+    "/process",
+    response_model=None,
+    responses={200: {"model": LLMProcessResponse}}
+)
 async def process_message_with_llm(
     request: LLMProcessRequest,
     user_id: str = Header(alias="x-user-id", default=None),
     authorization: str = Header(None)
-):
+) -> Response:
     """
     Process a message with LLM and generate a response.
     
@@ -114,9 +126,6 @@ async def process_message_with_llm(
         # Check rate limits
         await rate_limiter.check_rate_limit(user_id)
         
-        # Process message with LLM
-        service = MessageService()
-        
         # Convert to CreateMessageRequest
         message_request = CreateMessageRequest(
             conversation_id=request.conversation_id,
@@ -124,7 +133,8 @@ async def process_message_with_llm(
             metadata=request.metadata
         )
         
-        result = await service.process_message_with_llm(
+        # Process message with LLM
+        result = await message_service.process_message_with_llm(
             request=message_request,
             user_id=user_id,
             character_id=request.character_id,
@@ -133,10 +143,16 @@ async def process_message_with_llm(
             temperature=request.temperature
         )
         
-        return LLMProcessResponse(
-            user_message=result["user_message"],
-            assistant_message=result.get("assistant_message"),
-            error=result.get("error")
+        # The messages are already validated models, so serialize them directly
+        # instead of re-validating them through LLMProcessResponse; pydantic-core
+        # encodes the models straight to JSON without a model_dump pass
+        return Response(
+            content=to_json({
+                "user_message": result["user_message"],
+                "assistant_message": result.get("assistant_message"),
+                "error": result.get("error")
+            }),
+            media_type="application/json"
         )
         
     except RateLimitExceeded as e:
@@ -184,6 +200,88 @@ async def process_message_with_llm(
         )
 
 
+@router.post("/process/stream")
+async def stream_message_with_llm(
+    request: LLMProcessRequest,
+    http_request: Request,
+    user_id: str = Header(alias="x-user-id", default=None),
+    authorization: str = Header(None)
+) -> StreamingResponse:
+    """
+    Process a message with LLM and stream the response as Server-Sent Events.
+    
+    Each event is a `data:` frame holding a JSON object with a `type` key:
+    1. `user_message` with the stored user message
+    2. `delta` for every generated text fragment
+    3. `assistant_message` with the stored assistant message, or `error`
+    """
+    try:
+        # Get user ID from token if not provided in header (for testing)
+        if not user_id:
+            user_id = await get_user_id_from_token(authorization)
+        
+        # Check rate limits
+        await rate_limiter.check_rate_limit(user_id)
+        
+        message_request = CreateMessageRequest(
+            conversation_id=request.conversation_id,
+            content=request.content,
+            metadata=request.metadata
+        )
+        
+        # Store the user message before streaming so validation errors map to HTTP errors
+        user_message = await message_service.create_message(
+            message_request, user_id, request.character_id
+        )
+        
+    except RateLimitExceeded as e:
+        logger.warning("Rate limit exceeded", user_id=user_id, error=str(e))
+        raise HTTPException(
+            status_code=429,
+            detail={
+                "error": {
+                    "code": e.code,
+                    "message": e.message,
+                    "details": e.details
+                }
+            }
+        )
+    except ValidationError as e:
+        logger.warning("Validation error", error=str(e))
+        raise HTTPException(
+            status_code=400,
+            detail={
+                "error": {
+                    "code": e.code,
+                    "message": e.message,
+                    "details": e.details
+                }
+            }
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Failed to start LLM stream", error=str(e))
+        raise HTTPException(
+            status_code=500,
+            detail={"error": {"code": "INTERNAL_ERROR", "message": "Internal server error"}}
+        )
+    
+    async def event_stream():
+        async for event in message_service.stream_llm(
+            request=message_request,
+            user_message=user_message,
+            character_id=request.character_id,
+            system_prompt=request.system_prompt,
+            model=request.model,
+            temperature=request.temperature,
+            is_disconnected=http_request.is_disconnected
+        ):
+            yield b"data: " + orjson.dumps(event) + b"\n\n"
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+
 @router.get("/health", response_model=LLMHealthResponse)
 async def get_llm_health():
     """
@@ -193,20 +291,38 @@ async def get_llm_health():
     - LLM service connectivity
     - Service version and status
     - Configuration details
+    
+    Results are cached for `settings.health_cache_ttl` seconds so frequent
+    polling results in a single upstream check per window.
     """
-    try:
-        service = MessageService()
-        health_status = await service.get_llm_health_status()
+    global _health_cache
+    
+    cached = _health_cache
+    if cached and time.monotonic() - cached[0] < settings.health_cache_ttl:
+        return Response(content=cached[1], media_type="application/json")
+    
+    async with _health_lock:
+        # Another request may have refreshed the cache while we were waiting
+        cached = _health_cache
+        if cached and time.monotonic() - cached[0] < settings.health_cache_ttl:
+            return Response(content=cached[1], media_type="application/json")
         
-        return LLMHealthResponse(**health_status)
+        try:
+            health_status = await message_service.get_llm_health_status()
+            health = LLMHealthResponse(**health_status)
+            
+        except Exception as e:
+            logger.error("Failed to check LLM health", error=str(e))
+            health = LLMHealthResponse(
+                healthy=False,
+                base_url=settings.llm_service_url,
+                error=str(e)
+            )
         
-    except Exception as e:
-        logger.error("Failed to check LLM health", error=str(e))
-        return LLMHealthResponse(
-            healthy=False,
-            base_url=settings.llm_service_url,
-            error=str(e)
-        )
+        body = to_json(health)
+        _health_cache = (time.monotonic(), body)
+    
+    return Response(content=body, media_type="application/json")
 
 
 @router.get("/models")
@@ -2,10 +2,10 @@
 
 from typing import List, Dict, Any
 from fastapi import APIRouter, HTTPException, Header, Query, Path
-from fastapi.responses import JSONResponse
 import httpx
 
 from app.services.message_service import MessageService
+from app.models.auth import auth_client, auth_user_decoder
 from app.models.message import (
     MessageResponse
 )
@@ -26,28 +26,26 @@ async def get_user_id_from_token(authorization: str = Header(None)) -> str:
     
     try:
         # Call auth service to validate token
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{settings.auth_service_url}/api/v1/auth/validate",
-                headers={"Authorization": authorization},
-                timeout=10.0
-            )
-            
-            if response.status_code == 200:
-                user_data = response.json()
-                user_id = user_data.get("username") or user_data.get("id") or user_data.get("user_id") or user_data.get("sub")
-                if user_id:
-                    return user_id
-                else:
-                    logger.error("No user_id found in auth response", response=user_data)
-                    raise HTTPException(status_code=401, detail="Invalid token: no user ID")
-            elif response.status_code == 401:
-                logger.warning("Token validation failed", status=response.status_code)
-                raise HTTPException(status_code=401, detail="Invalid or expired token")
+        response = await auth_client.get(
+            f"{settings.auth_service_url}/api/v1/auth/validate",
+            headers={"Authorization": authorization},
+            timeout=10.0
+        )
+        
+        if response.status_code == 200:
+            user_id = auth_user_decoder.decode(response.content).resolved_user_id
+            if user_id:
+                return user_id
             else:
-                logger.error("Auth service error", status=response.status_code, response=response.text)
-                raise HTTPException(status_code=503, detail="Authentication service unavailable")
-                
+                logger.error("No user_id found in auth response", response=response.text)
+                raise HTTPException(status_code=401, detail="Invalid token: no user ID")
+        elif response.status_code == 401:
+            logger.warning("Token validation failed", status=response.status_code)
+            raise HTTPException(status_code=401, detail="Invalid or expired token")
+        else:
+            logger.error("Auth service error", status=response.status_code, response=response.text)
+            raise HTTPException(status_code=503, detail="Authentication service unavailable")
+            
     except httpx.TimeoutException:
         logger.error("Auth service timeout")
         raise HTTPException(status_code=503, detail="Authentication service timeout")
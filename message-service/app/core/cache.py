@@ -1,184 +1,125 @@
-"""Cache implementation for context windows and other data."""
+"""Cache implementation for LLM responses."""
 
-import hashlib
-from typing import List, Optional, Dict, Any
-from datetime import datetime
+import time
+from collections import OrderedDict
+from hashlib import sha256
+from typing import Optional, Dict, Any, Protocol, Tuple
 
+from app.core.config import settings
 from app.core.redis_client import redis_client
 from app.core.logging import get_logger
+from app.core.metrics import LLM_CACHE_LOOKUPS
 
 logger = get_logger(__name__)
 
 
-class ContextCache:
-    """Cache for conversation context windows."""
+class LLMCacheBackend(Protocol):
+    """Storage for cached LLM responses."""
     
-    def __init__(self):
-        self.cache_prefix = "context"
-        self.default_ttl = 600  # 10 minutes
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        ...
     
-    def _make_cache_key(self, conversation_id: str, window_size: int) -> str:
-        """Generate cache key for context."""
-        return f"{self.cache_prefix}:{conversation_id}:{window_size}"
+    async def set(self, key: str, value: Dict[str, Any], ttl: int) -> None:
+        ...
+
+
+class InMemoryLLMCacheBackend:
+    """Per-process LRU of LLM responses, capped at `max_entries`."""
     
-    async def get_context(
-        self, 
-        conversation_id: str, 
-        window_size: int
-    ) -> Optional[List[Dict[str, Any]]]:
-        """Get cached context window."""
-        try:
-            cache_key = self._make_cache_key(conversation_id, window_size)
-            context = await redis_client.get_json(cache_key)
-            
-            if context:
-                logger.debug(
-                    "Context cache hit",
-                    conversation_id=conversation_id,
-                    window_size=window_size
-                )
-            else:
-                logger.debug(
-                    "Context cache miss",
-                    conversation_id=conversation_id,
-                    window_size=window_size
-                )
-            
-            return context
-            
-        except Exception as e:
-            logger.error(
-                "Failed to get cached context",
-                conversation_id=conversation_id,
-                error=str(e)
-            )
+    def __init__(self, max_entries: int):
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self.max_entries = max_entries
+    
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(key)
+        if entry is None:
             return None
+        
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        
+        self._entries.move_to_end(key)
+        return value
     
-    async def set_context(
-        self,
-        conversation_id: str,
-        window_size: int,
-        context: List[Dict[str, Any]],
-        ttl: Optional[int] = None
-    ) -> bool:
-        """Cache context window."""
-        try:
-            cache_key = self._make_cache_key(conversation_id, window_size)
-            ttl = ttl or self.default_ttl
-            
-            success = await redis_client.set_json(cache_key, context, ttl)
-            
-            if success:
-                logger.debug(
-                    "Context cached",
-                    conversation_id=conversation_id,
-                    window_size=window_size,
-                    ttl=ttl
-                )
-            
-            return success
-            
-        except Exception as e:
-            logger.error(
-                "Failed to cache context",
-                conversation_id=conversation_id,
-                error=str(e)
-            )
-            return False
+    async def set(self, key: str, value: Dict[str, Any], ttl: int) -> None:
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+class RedisLLMCacheBackend:
+    """LLM responses shared across instances through Redis."""
     
-    async def invalidate_context(self, conversation_id: str) -> int:
-        """Invalidate all cached contexts for a conversation."""
-        try:
-            # In a production system, you'd use SCAN to find all keys with pattern
-            # For now, we'll just delete common window sizes
-            common_window_sizes = [10, 15, 20, 25, 30]
-            deleted_count = 0
-            
-            for window_size in common_window_sizes:
-                cache_key = self._make_cache_key(conversation_id, window_size)
-                deleted_count += await redis_client.delete(cache_key)
-            
-            logger.debug(
-                "Context invalidated",
-                conversation_id=conversation_id,
-                deleted_keys=deleted_count
-            )
-            
-            return deleted_count
-            
-        except Exception as e:
-            logger.error(
-                "Failed to invalidate context",
-                conversation_id=conversation_id,
-                error=str(e)
-            )
-            return 0
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        return await redis_client.get_json(key)
+    
+    async def set(self, key: str, value: Dict[str, Any], ttl: int) -> None:
+        await redis_client.set_json(key, value, ttl)
 
 
-class MessageCache:
-    """Cache for frequently accessed messages."""
+class LLMResponseCache:
+    """Exact-match cache for deterministic LLM requests.
     
-    def __init__(self):
-        self.cache_prefix = "message"
-        self.default_ttl = 1800  # 30 minutes
+    Only requests sampled with temperature 0 are cached, keyed by a SHA-256
+    of the encoded request body, so a hit is a response the model would
+    have produced anyway.
+    """
     
-    def _make_cache_key(self, message_id: str) -> str:
-        """Generate cache key for message."""
-        return f"{self.cache_prefix}:{message_id}"
+    def __init__(self, backend: LLMCacheBackend, ttl: int):
+        self.cache_prefix = "llm"
+        self.backend = backend
+        self.ttl = ttl
+        self.stats = {"hits": 0, "misses": 0}
     
-    async def get_message(self, message_id: str) -> Optional[Dict[str, Any]]:
-        """Get cached message."""
-        try:
-            cache_key = self._make_cache_key(message_id)
-            message = await redis_client.get_json(cache_key)
-            
-            if message:
-                logger.debug("Message cache hit", message_id=message_id)
-            else:
-                logger.debug("Message cache miss", message_id=message_id)
-            
-            return message
-            
-        except Exception as e:
-            logger.error("Failed to get cached message", message_id=message_id, error=str(e))
+    def cache_key(self, body: bytes, temperature: float) -> Optional[str]:
+        """Cache key for an encoded, non-streaming request body.
+        
+        Returns None if the request is sampled (temperature > 0). The body
+        must be encoded deterministically so equal requests share a key.
+        """
+        if temperature > 0:
             return None
+        
+        return f"{self.cache_prefix}:{sha256(body).hexdigest()}"
+    
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / lookups if lookups else 0.0
     
-    async def set_message(
-        self,
-        message_id: str,
-        message_data: Dict[str, Any],
-        ttl: Optional[int] = None
-    ) -> bool:
-        """Cache message."""
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Get a cached response; backend failures count as misses."""
         try:
-            cache_key = self._make_cache_key(message_id)
-            ttl = ttl or self.default_ttl
-            
-            success = await redis_client.set_json(cache_key, message_data, ttl)
-            
-            if success:
-                logger.debug("Message cached", message_id=message_id, ttl=ttl)
-            
-            return success
-            
+            value = await self.backend.get(key)
         except Exception as e:
-            logger.error("Failed to cache message", message_id=message_id, error=str(e))
-            return False
+            logger.error("Failed to get cached LLM response", error=str(e))
+            value = None
+        
+        if value is None:
+            self.stats["misses"] += 1
+            LLM_CACHE_LOOKUPS.labels("miss").inc()
+        else:
+            self.stats["hits"] += 1
+            LLM_CACHE_LOOKUPS.labels("hit").inc()
+        return value
     
-    async def invalidate_message(self, message_id: str) -> int:
-        """Invalidate cached message."""
+    async def set(self, key: str, value: Dict[str, Any]) -> bool:
+        """Cache a response."""
         try:
-            cache_key = self._make_cache_key(message_id)
-            deleted = await redis_client.delete(cache_key)
-            
-            logger.debug("Message cache invalidated", message_id=message_id)
-            return deleted
-            
+            await self.backend.set(key, value, self.ttl)
+            return True
         except Exception as e:
-            logger.error("Failed to invalidate message cache", message_id=message_id, error=str(e))
-            return 0
+            logger.error("Failed to cache LLM response", error=str(e))
+            return False
 
 
-# Global cache instances
-context_cache = ContextCache()
-message_cache = MessageCache()
\ No newline at end of file
+# Global cache instance
+if settings.llm_cache_backend == "redis":
+    llm_cache = LLMResponseCache(RedisLLMCacheBackend(), settings.llm_cache_ttl)
+else:
+    llm_cache = LLMResponseCache(
+        InMemoryLLMCacheBackend(settings.llm_cache_max_entries), settings.llm_cache_ttl
+    )
\ No newline at end of file
@@ -20,10 +20,13 @@ class Settings(BaseSettings):
     mongodb_database: str = Field(env="MONGODB_DATABASE")
     mongodb_connection_pool_min: int = Field(default=5, env="MONGODB_CONNECTION_POOL_MIN")
     mongodb_connection_pool_max: int = Field(default=20, env="MONGODB_CONNECTION_POOL_MAX")
+    mongodb_wait_queue_timeout_ms: int = Field(default=2000, env="MONGODB_WAIT_QUEUE_TIMEOUT_MS")
+    mongodb_compressors: str = Field(default="zstd,zlib", env="MONGODB_COMPRESSORS")
     
     # Redis Configuration
     redis_url: str = Field(env="REDIS_URL")
     redis_connection_pool_max: int = Field(default=20, env="REDIS_CONNECTION_POOL_MAX")
+    redis_protocol: int = Field(default=3, env="REDIS_PROTOCOL")
     cache_ttl_seconds: int = Field(default=300, env="CACHE_TTL_SECONDS")
     
     # External Services
@@ -36,10 +39,17 @@ class Settings(BaseSettings):
     default_llm_provider: str = Field(default="lmstudio", env="DEFAULT_LLM_PROVIDER")
     default_model: str = Field(default="google/gemma-3-12b", env="DEFAULT_MODEL")
     max_tokens_per_request: int = Field(default=2048, env="MAX_TOKENS_PER_REQUEST")
+    max_llm_payload_bytes: int = Field(default=4_194_304, env="MAX_LLM_PAYLOAD_BYTES")
     default_temperature: float = Field(default=0.7, env="DEFAULT_TEMPERATURE")
+    default_system_prompt: str = Field(default="You are a helpful assistant.", env="DEFAULT_SYSTEM_PROMPT")
     request_timeout_seconds: int = Field(default=30, env="REQUEST_TIMEOUT_SECONDS")
+    llm_cache_enabled: bool = Field(default=True, env="LLM_CACHE_ENABLED")
+    llm_cache_backend: str = Field(default="memory", env="LLM_CACHE_BACKEND")
+    llm_cache_ttl: int = Field(default=3600, env="LLM_CACHE_TTL")
+    llm_cache_max_entries: int = Field(default=1024, env="LLM_CACHE_MAX_ENTRIES")
     
     # Rate Limiting
+    rate_limit_backend: str = Field(default="redis", env="RATE_LIMIT_BACKEND")
     max_messages_per_minute: int = Field(default=100, env="MAX_MESSAGES_PER_MINUTE")
     max_messages_per_hour: int = Field(default=1000, env="MAX_MESSAGES_PER_HOUR")
     max_messages_per_day: int = Field(default=10000, env="MAX_MESSAGES_PER_DAY")
@@ -53,6 +63,7 @@ class Settings(BaseSettings):
     max_concurrent_llm_requests: int = Field(default=10, env="MAX_CONCURRENT_LLM_REQUESTS")
     message_processing_timeout: int = Field(default=60, env="MESSAGE_PROCESSING_TIMEOUT")
     batch_size_for_analytics: int = Field(default=100, env="BATCH_SIZE_FOR_ANALYTICS")
+    health_cache_ttl: float = Field(default=5.0, env="HEALTH_CACHE_TTL")
     
     # Workers
     worker_count: int = Field(default=2, env="WORKER_COUNT")
@@ -62,7 +73,13 @@ class Settings(BaseSettings):
         env_file = ".env"
         env_file_encoding = "utf-8"
         case_sensitive = False
+        frozen = True
 
 
 # Global settings instance
-settings = Settings()
\ No newline at end of file
+settings = Settings()
+
+# Hot-path limits as plain ints; settings are frozen so these never go stale
+MAX_MESSAGES_PER_MINUTE: int = settings.max_messages_per_minute
+MAX_MESSAGES_PER_HOUR: int = settings.max_messages_per_hour
+MAX_MESSAGES_PER_DAY: int = settings.max_messages_per_day
\ No newline at end of file
@@ -6,6 +6,8 @@ from typing import Dict, Any, Optional
 class MessageServiceException(Exception):
     """Base exception for Message Service."""
     
+    __slots__ = ("message", "code", "details")
+    
     def __init__(
         self, 
         message: str, 
@@ -14,7 +16,7 @@ class MessageServiceException(Exception):
     ):
         self.message = message
         self.code = code
-        self.details = details or {}
+        self.details = details if details is not None else {}
         super().__init__(self.message)
 
 
@@ -22,10 +24,15 @@ class ValidationError(MessageServiceException):
     """Validation error."""
     
     def __init__(self, message: str, field: str = None, details: Dict[str, Any] = None):
+        if details is None:
+            details = {"field": field}
+        else:
+            details = dict(details, field=field)
+        
         super().__init__(
             message=message,
             code="VALIDATION_ERROR",
-            details={**(details or {}), "field": field}
+            details=details
         )
 
 
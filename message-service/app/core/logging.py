@@ -2,28 +2,35 @@
 
 import logging
 import sys
+from functools import lru_cache
 from typing import Dict, Any
+import orjson
 import structlog
 from structlog.typing import FilteringBoundLogger
 
 from app.core.config import settings
 
 
+def _orjson_dumps(obj: Dict[str, Any], **kwargs) -> str:
+    """json.dumps-compatible serializer for structlog's JSONRenderer."""
+    return orjson.dumps(obj, default=kwargs.get("default")).decode()
+
+
 def setup_logging() -> FilteringBoundLogger:
     """Configure structured logging for the application."""
     
+    log_level = getattr(logging, settings.log_level.upper())
+    
     # Configure standard logging
     logging.basicConfig(
         format="%(message)s",
         stream=sys.stdout,
-        level=getattr(logging, settings.log_level.upper()),
+        level=log_level,
     )
     
     # Configure structlog
     structlog.configure(
         processors=[
-            # Filter out debug messages in production
-            structlog.stdlib.filter_by_level,
             # Add log level to output
             structlog.stdlib.add_logger_name,
             structlog.stdlib.add_log_level,
@@ -36,10 +43,17 @@ def setup_logging() -> FilteringBoundLogger:
             # Format exception info
             structlog.dev.set_exc_info,
             # JSON formatting for production, console for development
-            structlog.dev.ConsoleRenderer() if settings.debug 
-            else structlog.processors.JSONRenderer(),
+            *(
+                [structlog.dev.ConsoleRenderer()] if settings.debug
+                else [
+                    # Tracebacks become strings before the JSON renderer sees them
+                    structlog.processors.format_exc_info,
+                    structlog.processors.JSONRenderer(serializer=_orjson_dumps),
+                ]
+            ),
         ],
-        wrapper_class=structlog.stdlib.BoundLogger,
+        # Calls below the configured level return immediately, before any processor runs
+        wrapper_class=structlog.make_filtering_bound_logger(log_level),
         logger_factory=structlog.stdlib.LoggerFactory(),
         context_class=dict,
         cache_logger_on_first_use=True,
@@ -55,10 +69,16 @@ def setup_logging() -> FilteringBoundLogger:
     return logger
 
 
+@lru_cache(maxsize=256)
+def _get_named_logger(name: str) -> FilteringBoundLogger:
+    """Get a module logger, reusing the same instance for each name."""
+    return structlog.get_logger(name)
+
+
 def get_logger(name: str = None, **kwargs) -> FilteringBoundLogger:
     """Get a logger with additional context."""
     if name:
-        logger = structlog.get_logger(name)
+        logger = _get_named_logger(name)
     else:
         logger = structlog.get_logger()
     
@@ -69,4 +89,7 @@ def get_logger(name: str = None, **kwargs) -> FilteringBoundLogger:
 
 
 # Create default logger
-logger = setup_logging()
\ No newline at end of file
+logger = setup_logging()
+
+# Hot paths check this before building debug log kwargs that would be dropped anyway
+DEBUG_ENABLED = getattr(logging, settings.log_level.upper()) <= logging.DEBUG
\ No newline at end of file
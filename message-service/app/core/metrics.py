@@ -0,0 +1,35 @@
+"""Prometheus metrics for the Message Service."""
+
+from prometheus_client import Counter, Histogram
+
+LLM_TOKENS_USED = Counter(
+    "llm_tokens_used_total",
+    "Tokens consumed by LLM requests",
+    ["model"]
+)
+
+LLM_CACHED_TOKENS = Counter(
+    "llm_cached_prompt_tokens_total",
+    "Prompt tokens served from the provider's prompt cache",
+    ["model"]
+)
+
+LLM_PROCESSING_TIME = Histogram(
+    "llm_processing_time_seconds",
+    "Processing time reported by the LLM service",
+    ["model"],
+    buckets=(0.25, 0.5, 1, 2, 4, 8, 16, 32, 64)
+)
+
+LLM_REQUEST_TIME = Histogram(
+    "llm_request_duration_seconds",
+    "Time from sending an LLM request to its response, including retries",
+    ["model"],
+    buckets=(0.25, 0.5, 1, 2, 4, 8, 16, 32, 64)
+)
+
+LLM_CACHE_LOOKUPS = Counter(
+    "llm_cache_lookups_total",
+    "LLM response cache lookups",
+    ["result"]
+)
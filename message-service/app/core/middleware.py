@@ -0,0 +1,179 @@
+"""ASGI middleware for the Message Service."""
+
+import asyncio
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+class AccessLogQueue:
+    """Bounded queue that writes access logs from a background task.
+    
+    Requests only enqueue their log records; a drain task emits them in
+    batches after responses have been sent. When the queue is full, records
+    are dropped and counted rather than making requests wait.
+    """
+    
+    def __init__(self, maxsize: int = 10_000, batch_size: int = 64):
+        self._queue: "asyncio.Queue[Tuple[str, Dict[str, Any]]]" = asyncio.Queue(maxsize=maxsize)
+        self.batch_size = batch_size
+        self.dropped = 0
+        self._task: Optional[asyncio.Task] = None
+    
+    def put(self, event: str, **fields: Any) -> None:
+        """Queue a log record, or log it directly if the drain task is not running."""
+        if self._task is None:
+            logger.info(event, **fields)
+            return
+        
+        try:
+            self._queue.put_nowait((event, fields))
+        except asyncio.QueueFull:
+            self.dropped += 1
+    
+    def start(self) -> None:
+        """Start the drain task on the running loop."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._drain())
+    
+    async def stop(self) -> None:
+        """Stop the drain task and flush any queued records."""
+        if self._task is None:
+            return
+        
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        
+        self._flush(self._queue.qsize())
+        if self.dropped:
+            logger.warning("Access log records dropped", dropped=self.dropped)
+    
+    async def _drain(self) -> None:
+        while True:
+            event, fields = await self._queue.get()
+            logger.info(event, **fields)
+            self._flush(self.batch_size - 1)
+    
+    def _flush(self, limit: int) -> None:
+        for _ in range(limit):
+            try:
+                event, fields = self._queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            logger.info(event, **fields)
+
+
+access_log = AccessLogQueue()
+
+# Clients authenticate with bearer tokens, not cookies, so credentials are not
+# allowed; "*" is not valid alongside credentials anyway. Preflights are
+# granted whatever request headers they ask for (see StaticCORSMiddleware).
+CORS_RESPONSE_HEADERS = [
+    (b"access-control-allow-origin", b"*"),
+]
+CORS_PREFLIGHT_HEADERS = CORS_RESPONSE_HEADERS + [
+    (b"access-control-allow-methods", b"GET, POST, PUT, PATCH, DELETE, OPTIONS"),
+    (b"access-control-max-age", b"600"),
+    (b"vary", b"Access-Control-Request-Headers"),
+]
+
+
+class TimingLogMiddleware:
+    """Add the X-Process-Time header and log each request.
+    
+    A plain ASGI middleware, so requests and responses are not re-wrapped
+    as they are with BaseHTTPMiddleware, and a single clock pair serves both
+    the header and the log.
+    """
+    
+    def __init__(self, app: ASGIApp):
+        self.app = app
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        method = scope["method"]
+        path = scope["path"]
+        client = scope.get("client")
+        
+        access_log.put(
+            "Request received",
+            method=method,
+            path=path,
+            client_ip=client[0] if client else None
+        )
+        
+        start_time = time.perf_counter()
+        status_code = None
+        
+        async def send_with_timing(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = MutableHeaders(scope=message)
+                headers.append("X-Process-Time", str(time.perf_counter() - start_time))
+            await send(message)
+        
+        await self.app(scope, receive, send_with_timing)
+        
+        process_time = time.perf_counter() - start_time
+        access_log.put(
+            "Request completed",
+            method=method,
+            path=path,
+            status_code=status_code,
+            process_time=f"{process_time:.4f}s"
+        )
+
+
+class StaticCORSMiddleware:
+    """Allow cross-origin requests from any origin with precomputed headers.
+    
+    Preflight requests are answered directly with 204, echoing their
+    Access-Control-Request-Headers as the allowed headers; other responses
+    get the Access-Control-Allow-Origin header appended.
+    """
+    
+    def __init__(self, app: ASGIApp):
+        self.app = app
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        if scope["method"] == "OPTIONS":
+            request_method = requested_headers = None
+            for name, value in scope["headers"]:
+                if name == b"access-control-request-method":
+                    request_method = value
+                elif name == b"access-control-request-headers":
+                    requested_headers = value
+            
+            if request_method is not None:
+                # Copied: outer middleware may append to the header list
+                headers = list(CORS_PREFLIGHT_HEADERS)
+                if requested_headers:
+                    headers.append((b"access-control-allow-headers", requested_headers))
+                await send({"type": "http.response.start", "status": 204, "headers": headers})
+                await send({"type": "http.response.body", "body": b""})
+                return
+        
+        async def send_with_cors(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", ()), *CORS_RESPONSE_HEADERS]
+            await send(message)
+        
+        await self.app(scope, receive, send_with_cors)
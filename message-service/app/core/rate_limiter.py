@@ -1,35 +1,55 @@
 """Rate limiting implementation."""
 
 import time
-from typing import Dict, Tuple
-from datetime import datetime, timedelta
+from collections import OrderedDict, deque
+from typing import Deque, Dict, Tuple
 
-from app.core.exceptions import RateLimitExceeded
+from app.core.exceptions import RateLimitExceeded, RedisError
 from app.core.logging import get_logger
-from app.core.config import settings
+from app.core.config import (
+    settings,
+    MAX_MESSAGES_PER_MINUTE,
+    MAX_MESSAGES_PER_HOUR,
+    MAX_MESSAGES_PER_DAY,
+)
+from app.core.redis_client import redis_client
 
 logger = get_logger(__name__)
 
 
 class InMemoryRateLimiter:
-    """Simple in-memory rate limiter for development."""
+    """Simple in-memory rate limiter for development.
     
-    def __init__(self):
-        self._user_requests: Dict[str, Dict[str, list]] = {}
+    Tracked users are kept in LRU order and capped at `max_users`; every
+    `sweep_interval` new users, users with no requests in the last day are
+    dropped. The check itself has no await points, so it is atomic within
+    the event loop and needs no per-user locking.
+    """
+    
+    def __init__(self, max_users: int = 100_000, sweep_interval: int = 1000):
+        # Request timestamps are time.monotonic() seconds
+        self._user_requests: "OrderedDict[str, Dict[str, Deque[float]]]" = OrderedDict()
+        self.max_users = max_users
+        self.sweep_interval = sweep_interval
+        self._new_users_since_sweep = 0
     
     async def check_rate_limit(self, user_id: str) -> None:
         """Check if user has exceeded rate limits."""
-        current_time = datetime.utcnow()
+        current_time = time.monotonic()
+        
+        user_data = self._user_requests.get(user_id)
         
         # Initialize user tracking if not exists
-        if user_id not in self._user_requests:
-            self._user_requests[user_id] = {
-                'minute': [],
-                'hour': [],
-                'day': []
+        if user_data is None:
+            self._make_room(current_time)
+            user_data = {
+                'minute': deque(),
+                'hour': deque(),
+                'day': deque()
             }
-        
-        user_data = self._user_requests[user_id]
+            self._user_requests[user_id] = user_data
+        else:
+            self._user_requests.move_to_end(user_id)
         
         # Clean old requests
         self._clean_old_requests(user_data, current_time)
@@ -40,31 +60,31 @@ class InMemoryRateLimiter:
         day_count = len(user_data['day'])
         
         # Check per-minute limit
-        if minute_count >= settings.max_messages_per_minute:
-            reset_time = int((current_time + timedelta(minutes=1)).timestamp())
+        if minute_count >= MAX_MESSAGES_PER_MINUTE:
+            reset_time = int(time.time()) + 60
             raise RateLimitExceeded(
                 limit_type="messages_per_minute",
-                limit=settings.max_messages_per_minute,
+                limit=MAX_MESSAGES_PER_MINUTE,
                 current=minute_count,
                 reset_time=reset_time
             )
         
         # Check per-hour limit
-        if hour_count >= settings.max_messages_per_hour:
-            reset_time = int((current_time + timedelta(hours=1)).timestamp())
+        if hour_count >= MAX_MESSAGES_PER_HOUR:
+            reset_time = int(time.time()) + 3600
             raise RateLimitExceeded(
                 limit_type="messages_per_hour",
-                limit=settings.max_messages_per_hour,
+                limit=MAX_MESSAGES_PER_HOUR,
                 current=hour_count,
                 reset_time=reset_time
             )
         
         # Check per-day limit
-        if day_count >= settings.max_messages_per_day:
-            reset_time = int((current_time + timedelta(days=1)).timestamp())
+        if day_count >= MAX_MESSAGES_PER_DAY:
+            reset_time = int(time.time()) + 86400
             raise RateLimitExceeded(
                 limit_type="messages_per_day",
-                limit=settings.max_messages_per_day,
+                limit=MAX_MESSAGES_PER_DAY,
                 current=day_count,
                 reset_time=reset_time
             )
@@ -82,45 +102,141 @@ class InMemoryRateLimiter:
             day_count=day_count + 1
         )
     
-    def _clean_old_requests(self, user_data: Dict[str, list], current_time: datetime) -> None:
-        """Remove old requests from tracking."""
-        minute_ago = current_time - timedelta(minutes=1)
-        hour_ago = current_time - timedelta(hours=1)
-        day_ago = current_time - timedelta(days=1)
-        
-        user_data['minute'] = [
-            req_time for req_time in user_data['minute'] 
-            if req_time > minute_ago
-        ]
-        user_data['hour'] = [
-            req_time for req_time in user_data['hour'] 
-            if req_time > hour_ago
-        ]
-        user_data['day'] = [
-            req_time for req_time in user_data['day'] 
-            if req_time > day_ago
+    def _make_room(self, current_time: float) -> None:
+        """Sweep idle users periodically and evict the least recently seen past the cap."""
+        self._new_users_since_sweep += 1
+        if self._new_users_since_sweep >= self.sweep_interval:
+            self._sweep_idle_users(current_time)
+        
+        while len(self._user_requests) >= self.max_users:
+            self._user_requests.popitem(last=False)
+    
+    def _sweep_idle_users(self, current_time: float) -> None:
+        """Drop users without any request in the last day."""
+        day_ago = current_time - 86400
+        idle_users = [
+            user_id for user_id, user_data in self._user_requests.items()
+            if not user_data['day'] or user_data['day'][-1] <= day_ago
         ]
+        
+        for user_id in idle_users:
+            del self._user_requests[user_id]
+        
+        self._new_users_since_sweep = 0
+        
+        if idle_users:
+            logger.debug("Swept idle rate limit entries", removed=len(idle_users))
+    
+    def _clean_old_requests(self, user_data: Dict[str, Deque[float]], current_time: float) -> None:
+        """Remove old requests from tracking.
+        
+        Requests are appended in chronological order, so expired entries are
+        always at the head of each deque.
+        """
+        cutoffs = (
+            ('minute', current_time - 60),
+            ('hour', current_time - 3600),
+            ('day', current_time - 86400),
+        )
+        
+        for window, cutoff in cutoffs:
+            requests = user_data[window]
+            while requests and requests[0] <= cutoff:
+                requests.popleft()
     
     async def get_rate_limit_info(self, user_id: str) -> Dict[str, int]:
         """Get current rate limit status for user."""
-        current_time = datetime.utcnow()
+        current_time = time.monotonic()
         
         if user_id not in self._user_requests:
             return {
-                'minute_remaining': settings.max_messages_per_minute,
-                'hour_remaining': settings.max_messages_per_hour,
-                'day_remaining': settings.max_messages_per_day
+                'minute_remaining': MAX_MESSAGES_PER_MINUTE,
+                'hour_remaining': MAX_MESSAGES_PER_HOUR,
+                'day_remaining': MAX_MESSAGES_PER_DAY
             }
         
         user_data = self._user_requests[user_id]
         self._clean_old_requests(user_data, current_time)
         
         return {
-            'minute_remaining': max(0, settings.max_messages_per_minute - len(user_data['minute'])),
-            'hour_remaining': max(0, settings.max_messages_per_hour - len(user_data['hour'])),
-            'day_remaining': max(0, settings.max_messages_per_day - len(user_data['day']))
+            'minute_remaining': max(0, MAX_MESSAGES_PER_MINUTE - len(user_data['minute'])),
+            'hour_remaining': max(0, MAX_MESSAGES_PER_HOUR - len(user_data['hour'])),
+            'day_remaining': max(0, MAX_MESSAGES_PER_DAY - len(user_data['day']))
+        }
+
+
+class RedisRateLimiter:
+    """Fixed-window rate limiter backed by Redis, shared across worker processes."""
+    
+    # (limit name, key suffix, window length in seconds)
+    WINDOWS = (
+        ('minute', 'm', 60),
+        ('hour', 'h', 3600),
+        ('day', 'd', 86400),
+    )
+    
+    def __init__(self):
+        self.key_prefix = "rl"
+    
+    def _limits(self) -> Tuple[int, int, int]:
+        return (
+            MAX_MESSAGES_PER_MINUTE,
+            MAX_MESSAGES_PER_HOUR,
+            MAX_MESSAGES_PER_DAY
+        )
+    
+    def _make_keys(self, user_id: str) -> list:
+        return [f"{self.key_prefix}:{user_id}:{suffix}" for _, suffix, _ in self.WINDOWS]
+    
+    async def check_rate_limit(self, user_id: str) -> None:
+        """Check if user has exceeded rate limits.
+        
+        A rejected request is not counted against any window, matching
+        InMemoryRateLimiter.
+        """
+        counters = [
+            (key, limit, window_seconds)
+            for key, limit, (_, _, window_seconds) in zip(self._make_keys(user_id), self._limits(), self.WINDOWS)
+        ]
+        
+        try:
+            result = await redis_client.increment_within_limits(counters)
+        except RedisError as e:
+            # Fail open: an unavailable Redis should not block messaging
+            logger.warning("Rate limit check skipped, Redis unavailable", user_id=user_id, error=str(e))
+            return
+        
+        if not result[0]:
+            _, index, count, ttl = result
+            window, _, window_seconds = self.WINDOWS[index - 1]
+            raise RateLimitExceeded(
+                limit_type=f"messages_per_{window}",
+                limit=counters[index - 1][1],
+                current=count,
+                # The counter expires when its window does
+                reset_time=int(time.time()) + (ttl if ttl > 0 else window_seconds)
+            )
+        
+        logger.debug(
+            "Rate limit check passed",
+            user_id=user_id,
+            minute_count=result[1],
+            hour_count=result[2],
+            day_count=result[3]
+        )
+    
+    async def get_rate_limit_info(self, user_id: str) -> Dict[str, int]:
+        """Get current rate limit status for user."""
+        values = await redis_client.get_many(*self._make_keys(user_id))
+        
+        return {
+            f'{window}_remaining': max(0, limit - int(value or 0))
+            for (window, _, _), value, limit in zip(self.WINDOWS, values, self._limits())
         }
 
 
 # Global rate limiter instance
-rate_limiter = InMemoryRateLimiter()
\ No newline at end of file
+if settings.rate_limit_backend == "memory":
+    rate_limiter = InMemoryRateLimiter()
+else:
+    rate_limiter = RedisRateLimiter()
\ No newline at end of file
@@ -1,16 +1,41 @@
 """Redis client configuration and connection management."""
 
-import json
+import orjson
 import redis.asyncio as redis
-from typing import Optional, Any, Dict
-from urllib.parse import urlparse
+from redis.asyncio.connection import DefaultParser
+from redis.utils import HIREDIS_AVAILABLE
+from bson import ObjectId
+from typing import Optional, Any, Dict, List, Sequence, Tuple, Union
 
 from app.core.config import settings
-from app.core.logging import get_logger
+from app.core.logging import get_logger, DEBUG_ENABLED
 from app.core.exceptions import RedisError
 
 logger = get_logger(__name__)
 
+# datetimes are encoded natively by orjson; naive values are treated as UTC
+JSON_OPTIONS = orjson.OPT_NAIVE_UTC | orjson.OPT_UTC_Z
+
+# Increment every counter only if all are below their limits; a counter's TTL
+# starts on its first hit. ARGV holds a (limit, ttl) pair per key. Returns
+# {1, count...} when admitted, or {0, index, count, ttl} for the first counter
+# already at its limit.
+LIMITED_INCR_SCRIPT = """
+for i = 1, #KEYS do
+  local count = tonumber(redis.call('GET', KEYS[i]) or '0')
+  if count >= tonumber(ARGV[2 * i - 1]) then
+    return {0, i, count, redis.call('TTL', KEYS[i])}
+  end
+end
+local result = {1}
+for i = 1, #KEYS do
+  local count = redis.call('INCR', KEYS[i])
+  if count == 1 then redis.call('EXPIRE', KEYS[i], ARGV[2 * i]) end
+  result[i + 1] = count
+end
+return result
+"""
+
 
 class RedisClient:
     """Redis client wrapper with connection management."""
@@ -18,25 +43,33 @@ class RedisClient:
     def __init__(self):
         self._client: Optional[redis.Redis] = None
         self._pool: Optional[redis.ConnectionPool] = None
+        self._limited_incr = None
     
     async def connect(self):
         """Establish Redis connection."""
         try:
-            logger.info("Connecting to Redis", url=settings.redis_url)
-            
-            # Parse Redis URL
-            parsed_url = urlparse(settings.redis_url)
+            logger.info(
+                "Connecting to Redis",
+                url=settings.redis_url,
+                protocol=settings.redis_protocol,
+                parser="hiredis" if HIREDIS_AVAILABLE else "python"
+            )
+            if not HIREDIS_AVAILABLE:
+                logger.warning("hiredis not installed, falling back to the pure-Python RESP parser")
             
             # Create connection pool
             self._pool = redis.ConnectionPool.from_url(
                 settings.redis_url,
                 max_connections=settings.redis_connection_pool_max,
-                decode_responses=True,
-                encoding='utf-8'
+                # Values stay bytes; orjson decodes them without a str round-trip
+                decode_responses=False,
+                parser_class=DefaultParser,
+                protocol=settings.redis_protocol
             )
             
             # Create Redis client
             self._client = redis.Redis(connection_pool=self._pool)
+            self._limited_incr = self._client.register_script(LIMITED_INCR_SCRIPT)
             
             # Test connection
             await self._client.ping()
@@ -46,6 +79,12 @@ class RedisClient:
             logger.error("Failed to connect to Redis", error=str(e))
             raise RedisError("connect", f"Failed to connect to Redis: {str(e)}")
     
+    async def _ensure_connected(self) -> redis.Redis:
+        """Return the client, connecting lazily if startup did not connect."""
+        if not self._client:
+            await self.connect()
+        return self._client
+    
     async def disconnect(self):
         """Close Redis connection."""
         if self._client:
@@ -57,14 +96,14 @@ class RedisClient:
             await self._pool.aclose()
             self._pool = None
     
-    async def get(self, key: str) -> Optional[str]:
+    async def get(self, key: str) -> Optional[bytes]:
         """Get value from Redis."""
         try:
-            if not self._client:
-                await self.connect()
+            client = self._client or await self._ensure_connected()
             
-            value = await self._client.get(key)
-            logger.debug("Redis GET", key=key, found=value is not None)
+            value = await client.get(key)
+            if DEBUG_ENABLED:
+                logger.debug("Redis GET", key=key, found=value is not None)
             return value
             
         except Exception as e:
@@ -74,18 +113,18 @@ class RedisClient:
     async def set(
         self, 
         key: str, 
-        value: str, 
+        value: Union[str, bytes], 
         ttl: Optional[int] = None
     ) -> bool:
         """Set value in Redis with optional TTL."""
         try:
-            if not self._client:
-                await self.connect()
+            client = self._client or await self._ensure_connected()
             
             ttl = ttl or settings.cache_ttl_seconds
             
-            result = await self._client.setex(key, ttl, value)
-            logger.debug("Redis SET", key=key, ttl=ttl, success=result)
+            result = await client.setex(key, ttl, value)
+            if DEBUG_ENABLED:
+                logger.debug("Redis SET", key=key, ttl=ttl, success=result)
             return result
             
         except Exception as e:
@@ -95,11 +134,11 @@ class RedisClient:
     async def delete(self, key: str) -> int:
         """Delete key from Redis."""
         try:
-            if not self._client:
-                await self.connect()
+            client = self._client or await self._ensure_connected()
             
-            result = await self._client.delete(key)
-            logger.debug("Redis DELETE", key=key, deleted=result)
+            result = await client.delete(key)
+            if DEBUG_ENABLED:
+                logger.debug("Redis DELETE", key=key, deleted=result)
             return result
             
         except Exception as e:
@@ -109,10 +148,9 @@ class RedisClient:
     async def exists(self, key: str) -> bool:
         """Check if key exists in Redis."""
         try:
-            if not self._client:
-                await self.connect()
+            client = self._client or await self._ensure_connected()
             
-            result = await self._client.exists(key)
+            result = await client.exists(key)
             return bool(result)
             
         except Exception as e:
@@ -127,48 +165,112 @@ class RedisClient:
     ) -> bool:
         """Set JSON value in Redis."""
         try:
-            json_value = json.dumps(value, default=str)
-            return await self.set(key, json_value, ttl)
-            
-        except (TypeError, ValueError) as e:
+            json_value = orjson.dumps(value, default=_encode_default, option=JSON_OPTIONS)
+        except TypeError as e:
             logger.error("JSON serialization failed", key=key, error=str(e))
             raise RedisError("set_json", f"Failed to serialize value for key {key}: {str(e)}")
+        
+        try:
+            client = self._client or await self._ensure_connected()
+            
+            ttl = ttl or settings.cache_ttl_seconds
+            
+            result = await client.setex(key, ttl, json_value)
+            if DEBUG_ENABLED:
+                logger.debug("Redis SET", key=key, ttl=ttl, success=result)
+            return result
+            
+        except Exception as e:
+            logger.error("Redis SET failed", key=key, error=str(e))
+            raise RedisError("set_json", f"Failed to set key {key}: {str(e)}")
     
     async def get_json(self, key: str) -> Optional[Any]:
         """Get JSON value from Redis."""
         try:
-            value = await self.get(key)
+            client = self._client or await self._ensure_connected()
+            
+            value = await client.get(key)
+            if DEBUG_ENABLED:
+                logger.debug("Redis GET", key=key, found=value is not None)
             if value is None:
                 return None
             
-            return json.loads(value)
+            return orjson.loads(value)
             
-        except json.JSONDecodeError as e:
+        except orjson.JSONDecodeError as e:
             logger.error("JSON deserialization failed", key=key, error=str(e))
             raise RedisError("get_json", f"Failed to deserialize value for key {key}: {str(e)}")
+        except Exception as e:
+            logger.error("Redis GET failed", key=key, error=str(e))
+            raise RedisError("get_json", f"Failed to get key {key}: {str(e)}")
     
     async def increment(self, key: str, amount: int = 1) -> int:
         """Increment a counter in Redis."""
         try:
-            if not self._client:
-                await self.connect()
+            client = self._client or await self._ensure_connected()
             
-            result = await self._client.incrby(key, amount)
-            logger.debug("Redis INCREMENT", key=key, amount=amount, new_value=result)
+            result = await client.incrby(key, amount)
+            if DEBUG_ENABLED:
+                logger.debug("Redis INCREMENT", key=key, amount=amount, new_value=result)
             return result
             
         except Exception as e:
             logger.error("Redis INCREMENT failed", key=key, error=str(e))
             raise RedisError("increment", f"Failed to increment key {key}: {str(e)}")
     
+    async def increment_within_limits(self, counters: Sequence[Tuple[str, int, int]]) -> List[int]:
+        """Increment several counters atomically, unless any is at its limit.
+        
+        Each counter is a (key, limit, ttl) tuple; the TTL is set only when
+        the counter is created, giving fixed-window semantics. Runs as one
+        script, so the check and the increments are a single round trip and
+        no other client interleaves with them.
+        
+        Returns:
+            [1, count, ...] with every new count if all counters were below
+            their limits, otherwise [0, index, count, ttl] for the first
+            counter at its limit (1-based index); nothing is incremented then
+        """
+        try:
+            client = self._client or await self._ensure_connected()
+            
+            args = []
+            for _, limit, ttl in counters:
+                args.extend((limit, ttl))
+            result = await self._limited_incr(
+                keys=[key for key, _, _ in counters], args=args, client=client
+            )
+            
+            if DEBUG_ENABLED:
+                logger.debug("Redis limited INCREMENT", keys=len(counters), result=result)
+            return result
+            
+        except Exception as e:
+            logger.error("Redis limited INCREMENT failed", keys=len(counters), error=str(e))
+            raise RedisError("increment_within_limits", f"Failed to increment {len(counters)} keys: {str(e)}")
+    
+    async def get_many(self, *keys: str) -> List[Optional[bytes]]:
+        """Get multiple values from Redis in a single round trip."""
+        try:
+            client = self._client or await self._ensure_connected()
+            
+            values = await client.mget(keys)
+            if DEBUG_ENABLED:
+                logger.debug("Redis MGET", keys=len(keys))
+            return values
+            
+        except Exception as e:
+            logger.error("Redis MGET failed", keys=len(keys), error=str(e))
+            raise RedisError("get_many", f"Failed to get {len(keys)} keys: {str(e)}")
+    
     async def expire(self, key: str, ttl: int) -> bool:
         """Set TTL for existing key."""
         try:
-            if not self._client:
-                await self.connect()
+            client = self._client or await self._ensure_connected()
             
-            result = await self._client.expire(key, ttl)
-            logger.debug("Redis EXPIRE", key=key, ttl=ttl, success=result)
+            result = await client.expire(key, ttl)
+            if DEBUG_ENABLED:
+                logger.debug("Redis EXPIRE", key=key, ttl=ttl, success=result)
             return result
             
         except Exception as e:
@@ -176,5 +278,12 @@ class RedisClient:
             raise RedisError("expire", f"Failed to set TTL for key {key}: {str(e)}")
 
 
+def _encode_default(value: Any) -> str:
+    """Encode the non-native types that can appear in cached documents."""
+    if isinstance(value, ObjectId):
+        return str(value)
+    raise TypeError(f"Type is not serializable: {type(value).__name__}")
+
+
 # Global Redis client instance
 redis_client = RedisClient()
\ No newline at end of file
@@ -1,10 +1,13 @@
 """Database connection and initialization."""
 
+import asyncio
+
 from motor.motor_asyncio import AsyncIOMotorClient
 from beanie import init_beanie
 from typing import Optional
 
 from app.core.config import settings
+from app.core.exceptions import DatabaseError
 from app.core.logging import get_logger
 from app.models.database import Message
 
@@ -30,6 +33,18 @@ async def connect_to_database():
             settings.mongodb_url,
             minPoolSize=settings.mongodb_connection_pool_min,
             maxPoolSize=settings.mongodb_connection_pool_max,
+            # Keep idle sockets long enough to survive gaps between bursts
+            maxIdleTimeMS=60_000,
+            # How long a request waits for a pooled connection before failing
+            waitQueueTimeoutMS=settings.mongodb_wait_queue_timeout_ms,
+            serverSelectionTimeoutMS=3_000,
+            # Negotiated with the server; zstd needs the zstandard package
+            compressors=settings.mongodb_compressors,
+            zlibCompressionLevel=-1,
+            retryWrites=True,
+            uuidRepresentation="standard",
+            appname=settings.service_name,
+            io_loop=asyncio.get_running_loop(),
         )
         
         # Get database
@@ -41,6 +56,11 @@ async def connect_to_database():
             document_models=[Message]
         )
         
+        # Open the minimum pool up front so the first requests skip the handshakes
+        await asyncio.gather(*(
+            db.command("ping") for _ in range(settings.mongodb_connection_pool_min)
+        ))
+        
         logger.info("Connected to MongoDB successfully")
         
     except Exception as e:
@@ -56,7 +76,11 @@ async def close_database_connection():
 
 
 async def get_database():
-    """Get database instance."""
+    """Get database instance.
+    
+    Raises:
+        DatabaseError: If called before the startup connection was made
+    """
     if not database.client:
-        await connect_to_database()
+        raise DatabaseError("get_database", "Database is not connected")
     return database.client[settings.mongodb_database]
\ No newline at end of file
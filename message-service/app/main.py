@@ -1,15 +1,22 @@
 """Main FastAPI application for the Message Service."""
 
+import asyncio
 from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
-from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse, Response
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+import orjson
 import time
 
 from app.core.config import settings
 from app.core.logging import get_logger, setup_logging
-from app.core.exceptions import MessageServiceException
+from app.core.exceptions import MessageServiceException, RedisError
+from app.core.middleware import StaticCORSMiddleware, TimingLogMiddleware, access_log
+from app.core.redis_client import redis_client
 from app.database import connect_to_database, close_database_connection
+from app.models.auth import auth_client
+from app.services.llm_service import llm_service
+from app.services.message_service import pending_writes
 from app.api.v1 import router as api_v1_router
 
 # Setup logging
@@ -19,7 +26,14 @@ logger = setup_logging()
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan events."""
-    logger.info("Starting Message Service", port=settings.port)
+    # uvicorn runs on uvloop when available (uvicorn[standard], not on Windows)
+    logger.info(
+        "Starting Message Service",
+        port=settings.port,
+        event_loop=type(asyncio.get_running_loop()).__module__
+    )
+    
+    access_log.start()
     
     # Startup
     try:
@@ -29,11 +43,22 @@ async def lifespan(app: FastAPI):
         logger.error("Failed to connect to database", error=str(e))
         raise
     
+    try:
+        await redis_client.connect()
+    except RedisError as e:
+        # Redis-backed features degrade gracefully and reconnect on first use
+        logger.warning("Redis unavailable at startup", error=str(e))
+    
     yield
     
     # Shutdown
     logger.info("Shutting down Message Service")
+    await llm_service.close()
+    await auth_client.aclose()
+    await pending_writes.drain()
+    await redis_client.disconnect()
     await close_database_connection()
+    await access_log.stop()
 
 
 # Create FastAPI application
@@ -43,55 +68,15 @@ app = FastAPI(
     version="1.0.0",
     docs_url="/docs",
     redoc_url="/redoc",
+    default_response_class=ORJSONResponse,
     lifespan=lifespan
 )
 
 # CORS middleware
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],  # Configure appropriately for production
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
+app.add_middleware(StaticCORSMiddleware)  # Configure appropriately for production
 
-@app.middleware("http")
-async def add_process_time_header(request: Request, call_next):
-    """Add processing time to response headers."""
-    start_time = time.time()
-    response = await call_next(request)
-    process_time = time.time() - start_time
-    response.headers["X-Process-Time"] = str(process_time)
-    return response
-
-
-@app.middleware("http")
-async def log_requests(request: Request, call_next):
-    """Log all requests."""
-    start_time = time.time()
-    
-    # Log request
-    logger.info(
-        "Request received",
-        method=request.method,
-        path=request.url.path,
-        client_ip=request.client.host if request.client else None
-    )
-    
-    response = await call_next(request)
-    
-    # Log response
-    process_time = time.time() - start_time
-    logger.info(
-        "Request completed",
-        method=request.method,
-        path=request.url.path,
-        status_code=response.status_code,
-        process_time=f"{process_time:.4f}s"
-    )
-    
-    return response
+# Request timing header and access logging
+app.add_middleware(TimingLogMiddleware)
 
 
 @app.exception_handler(MessageServiceException)
@@ -107,7 +92,7 @@ async def message_service_exception_handler(request: Request, exc: MessageServic
     elif exc.code == "CONTENT_SAFETY_VIOLATION":
         status_code = 422
     
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=status_code,
         content={
             "error": {
@@ -129,7 +114,7 @@ async def general_exception_handler(request: Request, exc: Exception):
         method=request.method
     )
     
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=500,
         content={
             "error": {
@@ -140,17 +125,38 @@ async def general_exception_handler(request: Request, exc: Exception):
     )
 
 
+# Health and root bodies are static apart from the health timestamp, so they
+# are serialized once here instead of on every load balancer probe
+_HEALTH_PREFIX = orjson.dumps({
+    "status": "healthy",
+    "service": settings.service_name,
+    "version": "1.0.0",
+    "environment": settings.environment
+})[:-1] + b',"timestamp":'
+
+_ROOT_BODY = orjson.dumps({
+    "service": settings.service_name,
+    "version": "1.0.0",
+    "status": "running",
+    "docs_url": "/docs"
+})
+
+
 # Health check endpoint
 @app.get("/health")
 async def health_check():
     """Health check endpoint."""
-    return {
-        "status": "healthy",
-        "service": settings.service_name,
-        "version": "1.0.0",
-        "environment": settings.environment,
-        "timestamp": time.time()
-    }
+    return Response(
+        content=_HEALTH_PREFIX + orjson.dumps(time.time()) + b"}",
+        media_type="application/json"
+    )
+
+
+# Prometheus metrics endpoint
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics endpoint."""
+    return Response(content=generate_latest(), headers={"Content-Type": CONTENT_TYPE_LATEST})
 
 
 # Include API routers
@@ -161,21 +167,4 @@ app.include_router(api_v1_router)
 @app.get("/")
 async def root():
     """Root endpoint."""
-    return {
-        "service": settings.service_name,
-        "version": "1.0.0",
-        "status": "running",
-        "docs_url": "/docs"
-    }
-
-
-if __name__ == "__main__":
-    import uvicorn
-    
-    uvicorn.run(
-        "app.main:app",
-        host="0.0.0.0",
-        port=settings.port,
-        reload=settings.debug,
-        log_level=settings.log_level.lower()
-    )
\ No newline at end of file
+    return Response(content=_ROOT_BODY, media_type="application/json")
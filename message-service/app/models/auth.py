@@ -0,0 +1,26 @@
+"""Typed models for responses from the Auth Service."""
+
+from typing import Optional, Union
+import httpx
+import msgspec
+
+
+class AuthUserResponse(msgspec.Struct):
+    """User payload returned by the Auth Service token validation endpoint."""
+    username: Optional[str] = None
+    id: Optional[Union[str, int]] = None
+    user_id: Optional[Union[str, int]] = None
+    sub: Optional[str] = None
+    
+    @property
+    def resolved_user_id(self) -> Optional[Union[str, int]]:
+        """First available user identifier, in order of preference."""
+        return self.username or self.id or self.user_id or self.sub
+
+
+# Reusable decoder: parses and validates the raw response body in a single pass
+auth_user_decoder = msgspec.json.Decoder(AuthUserResponse)
+
+# Shared client for token validation, so calls reuse pooled keep-alive connections
+# to the Auth Service instead of connecting per request; closed on shutdown
+auth_client = httpx.AsyncClient()
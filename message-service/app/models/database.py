@@ -3,29 +3,52 @@
 from datetime import datetime
 from typing import Dict, List, Optional, Any
 from beanie import Document, Indexed
-from pydantic import BaseModel, Field, validator
-import uuid
+from pydantic import BaseModel, Field, field_validator
+from pymongo import IndexModel, TEXT
+import secrets
+import threading
 
+from app.models.message import MessageRole
 
 
+# Random bytes are drawn in bulk; each message ID uses 6 of them (48 bits)
+_ID_BYTES = 6
+_ID_POOL_SIZE = 4096
+_id_pool = b""
+_id_offset = 0
+_id_lock = threading.Lock()
+
+
+def _next_message_id() -> str:
+    """Generate a message ID, refilling the random pool once per ~680 IDs."""
+    global _id_pool, _id_offset
+    with _id_lock:
+        if _id_offset + _ID_BYTES > len(_id_pool):
+            _id_pool = secrets.token_bytes(_ID_POOL_SIZE)
+            _id_offset = 0
+        chunk = _id_pool[_id_offset:_id_offset + _ID_BYTES]
+        _id_offset += _ID_BYTES
+    return f"msg_{chunk.hex()}"
+
 
 class Message(Document):
     """Main message document."""
     
     # Core identifiers
-    message_id: Indexed(str) = Field(default_factory=lambda: f"msg_{uuid.uuid4().hex[:12]}")
+    message_id: Indexed(str) = Field(default_factory=_next_message_id)
     conversation_id: Indexed(str)
     user_id: Indexed(str)
     character_id: Optional[str] = None
     
-    # Message content - simplified to dict to maintain flexibility
-    content: Dict[str, Any] = Field(default_factory=dict)
+    # Message content
+    text: str
     
     # Message metadata
-    role: str = Field(pattern="^(user|assistant|system)$")
+    role: MessageRole
     
-    # Timestamps - simplified to dict
-    timestamps: Dict[str, Any] = Field(default_factory=dict)
+    # Timestamps
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: Optional[datetime] = None
     
     # LLM specific data (only for assistant messages) - simplified to dict
     llm_metadata: Optional[Dict[str, Any]] = None
@@ -33,30 +56,14 @@ class Message(Document):
     # Custom extensible metadata
     custom_metadata: Dict[str, Any] = Field(default_factory=dict)
     
-    @validator('message_id', pre=True, always=True)
-    def generate_message_id(cls, v):
-        return v or f"msg_{uuid.uuid4().hex[:12]}"
-    
-    @validator('timestamps', pre=True, always=True)
-    def set_timestamps(cls, v):
-        if isinstance(v, dict):
-            if 'created_at' not in v:
-                v['created_at'] = datetime.utcnow()
-        else:
-            v = {'created_at': datetime.utcnow()}
-        return v
-    
-    @validator('content', pre=True)
-    def validate_content(cls, v):
-        if isinstance(v, str):
-            v = {'text': v}
-        
-        # Basic content validation
-        text = v.get('text', '')
-        if not text or len(text.strip()) == 0:
+    @field_validator('text')
+    @classmethod
+    def validate_text(cls, v):
+        # isspace() scans in place instead of allocating a stripped copy
+        if not v or v.isspace():
             raise ValueError("Message text cannot be empty")
         
-        if len(text) > 50000:
+        if len(v) > 50000:
             raise ValueError("Message text exceeds maximum length of 50,000 characters")
         
         return v
@@ -67,7 +74,44 @@ class Message(Document):
             "message_id",
             "conversation_id",
             "user_id",
-            [("conversation_id", 1), ("timestamps.created_at", -1)],
-            [("user_id", 1), ("timestamps.created_at", -1)],
-            [("timestamps.created_at", -1)],
-        ]
\ No newline at end of file
+            # message_id breaks created_at ties for keyset pagination
+            [("conversation_id", 1), ("created_at", -1), ("message_id", -1)],
+            [("user_id", 1), ("created_at", -1), ("message_id", -1)],
+            [("created_at", -1)],
+            # Must match scripts/setup_indexes.py: a collection has one text index
+            IndexModel(
+                [("text", TEXT), ("custom_metadata.topics", TEXT)],
+                name="idx_text_search",
+                weights={"text": 10, "custom_metadata.topics": 5}
+            ),
+        ]
+
+
+class MessageSummary(BaseModel):
+    """Projection of a message without its LLM and custom metadata.
+    
+    Only the projected fields are sent by MongoDB; the metadata fields keep
+    their defaults so the projection converts like a full Message.
+    """
+    
+    message_id: str
+    conversation_id: str
+    user_id: str
+    character_id: Optional[str] = None
+    text: str
+    role: MessageRole
+    created_at: datetime
+    llm_metadata: Optional[Dict[str, Any]] = None
+    custom_metadata: Dict[str, Any] = Field(default_factory=dict)
+    
+    class Settings:
+        projection = {
+            "message_id": 1,
+            "conversation_id": 1,
+            "user_id": 1,
+            "character_id": 1,
+            "text": 1,
+            "role": 1,
+            "created_at": 1,
+        }
+
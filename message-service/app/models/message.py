@@ -1,8 +1,8 @@
 """Pydantic models for API request/response validation."""
 
 from datetime import datetime
-from typing import Dict, List, Optional, Any
-from pydantic import BaseModel, Field, validator
+from typing import Annotated, Dict, List, Optional, Any
+from pydantic import BaseModel, Field, StringConstraints, TypeAdapter
 from enum import Enum
 
 
@@ -18,15 +18,12 @@ class MessageRole(str, Enum):
 class CreateMessageRequest(BaseModel):
     """Request model for creating a message."""
     conversation_id: str = Field(..., description="ID of the target conversation")
-    content: str = Field(..., min_length=1, max_length=50000, description="Message content")
+    # Whitespace is stripped before the length check, so blank content is rejected
+    content: Annotated[str, StringConstraints(strip_whitespace=True)] = Field(
+        ..., min_length=1, max_length=50000, description="Message content"
+    )
     client_msg_id: Optional[str] = Field(None, description="Client message ID for idempotency")
     metadata: Dict[str, Any] = Field(default_factory=dict, description="Additional metadata")
-    
-    @validator('content')
-    def validate_content(cls, v):
-        if not v or not v.strip():
-            raise ValueError("Message content cannot be empty")
-        return v.strip()
 
 
 class MessageResponse(BaseModel):
@@ -42,6 +39,16 @@ class MessageResponse(BaseModel):
     custom_metadata: Dict[str, Any] = Field(default_factory=dict, description="Additional metadata")
 
 
+# Validates or serializes a whole page of messages in one pydantic-core call
+MESSAGE_LIST_ADAPTER = TypeAdapter(List[MessageResponse])
+
+
+class MessagePage(BaseModel):
+    """A page of messages, newest first."""
+    messages: List[MessageResponse]
+    next_cursor: Optional[str] = Field(None, description="Cursor for the next page; None on the last page")
+
+
 class ConversationMessagesRequest(BaseModel):
     """Request model for getting conversation messages (internal use only)."""
     limit: int = Field(default=50, ge=1, le=1000)
@@ -49,4 +56,5 @@ class ConversationMessagesRequest(BaseModel):
     role: Optional[MessageRole] = None
     start_date: Optional[datetime] = None
     end_date: Optional[datetime] = None
-    include_archived: bool = False
\ No newline at end of file
+    include_archived: bool = False
+    include_metadata: bool = Field(default=True, description="Include LLM and custom metadata")
@@ -1,18 +1,92 @@
 """Message repository for database operations."""
 
+import base64
+import functools
+import re
 from datetime import datetime
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple, Type, Union
+import orjson
+from pydantic import BaseModel
 from beanie import PydanticObjectId
 from beanie.odm.operators.find.comparison import In
 from pymongo import DESCENDING
 
-from app.models.database import Message
+from app.models.database import Message, MessageSummary
 from app.models.message import MessageRole
-from app.core.exceptions import NotFoundError, DatabaseError
-from app.core.logging import get_logger
+from app.core.exceptions import NotFoundError, DatabaseError, ValidationError
+from app.core.logging import get_logger, DEBUG_ENABLED
 
 logger = get_logger(__name__)
 
+# Search terms shorter than this are matched as a text prefix instead of via $text
+PREFIX_SEARCH_MAX_LENGTH = 5
+
+# Plain string values for role filters, so query encoding skips the Enum branch
+_ROLE_VALUES = {role: role.value for role in MessageRole}
+
+# Fields an LLM prompt needs from each history message
+_TURN_PROJECTION = {"_id": 0, "message_id": 1, "role": 1, "text": 1}
+
+
+def encode_cursor(message: Union[Message, BaseModel]) -> str:
+    """Build the cursor for the page that follows `message` (newest first)."""
+    raw = orjson.dumps({"t": message.created_at, "id": message.message_id})
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def _decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    """Decode a cursor into its (created_at, message_id) position."""
+    try:
+        position = orjson.loads(base64.urlsafe_b64decode(cursor))
+        return datetime.fromisoformat(position["t"]), position["id"]
+    except (ValueError, KeyError, TypeError):
+        raise ValidationError("Invalid pagination cursor", field="cursor")
+
+
+def _after_cursor(cursor: str) -> Dict[str, Any]:
+    """Keyset predicate for messages strictly older than the cursor position."""
+    created_at, message_id = _decode_cursor(cursor)
+    return {"$or": [
+        {"created_at": {"$lt": created_at}},
+        {"created_at": created_at, "message_id": {"$lt": message_id}}
+    ]}
+
+
+def _page(messages: list, limit: int) -> Tuple[list, Optional[str]]:
+    """Split `limit + 1` fetched messages into a page and the next page's cursor."""
+    if len(messages) <= limit:
+        return messages, None
+    
+    del messages[limit:]
+    return messages, encode_cursor(messages[-1])
+
+
+@functools.lru_cache(maxsize=32)
+def _conversation_filter_builder(has_role: bool, has_start: bool, has_end: bool):
+    """Return a function building the raw conversation filter for one filter shape.
+    
+    The branching on which filters are present happens once per shape, so
+    each query only allocates its filter dict.
+    """
+    def build(
+        conversation_id: str,
+        role: Optional[MessageRole],
+        start_date: Optional[datetime],
+        end_date: Optional[datetime]
+    ) -> Dict[str, Any]:
+        query: Dict[str, Any] = {"conversation_id": conversation_id}
+        if has_role:
+            query["role"] = _ROLE_VALUES[role]
+        if has_start and has_end:
+            query["created_at"] = {"$gte": start_date, "$lte": end_date}
+        elif has_start:
+            query["created_at"] = {"$gte": start_date}
+        elif has_end:
+            query["created_at"] = {"$lte": end_date}
+        return query
+    
+    return build
+
 
 class MessageRepository:
     """Repository for message database operations."""
@@ -27,66 +101,107 @@ class MessageRepository:
         metadata: Optional[Dict[str, Any]] = None
     ) -> Message:
         """Create a new message."""
+        message = self.build_message(
+            conversation_id=conversation_id,
+            user_id=user_id,
+            content=content,
+            role=role,
+            character_id=character_id,
+            metadata=metadata
+        )
+        return await self.insert_message(message)
+
+    async def insert_message(self, message: Message) -> Message:
+        """Insert a message built with `build_message`."""
         try:
-            message = Message(
-                conversation_id=conversation_id,
-                user_id=user_id,
-                content={'text': content},
-                role=role.value,
-                character_id=character_id,
-                timestamps={'created_at': datetime.utcnow()},
-                custom_metadata=metadata or {}
-            )
-            
             await message.insert()
             logger.info("Message created", message_id=message.message_id)
             return message
             
         except Exception as e:
-            logger.error("Failed to create message", error=str(e))
+            logger.error("Failed to create message", message_id=message.message_id, error=str(e))
             raise DatabaseError("create_message", f"Failed to create message: {str(e)}")
 
+    @staticmethod
+    def build_message(
+        conversation_id: str,
+        user_id: str,
+        content: str,
+        role: MessageRole = MessageRole.USER,
+        character_id: Optional[str] = None,
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> Message:
+        """Build a message document without writing it.
+        
+        The message ID and creation time are assigned here, so the message
+        can be returned to callers before it is inserted.
+        """
+        return Message(
+            conversation_id=conversation_id,
+            user_id=user_id,
+            text=content,
+            role=role,
+            character_id=character_id,
+            custom_metadata=metadata or {}
+        )
+
+
+    def _conversation_filters(
+        self,
+        conversation_id: str,
+        role: Optional[MessageRole] = None,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None
+    ) -> list:
+        """Build the filters shared by conversation listing and counting."""
+        build = _conversation_filter_builder(bool(role), bool(start_date), bool(end_date))
+        return [build(conversation_id, role, start_date, end_date)]
 
     async def get_conversation_messages(
         self,
         conversation_id: str,
         limit: int = 50,
-        skip: int = 0,
+        cursor: Optional[str] = None,
         role: Optional[MessageRole] = None,
         start_date: Optional[datetime] = None,
         end_date: Optional[datetime] = None,
-        include_archived: bool = False
-    ) -> List[Message]:
-        """Get messages for a conversation with filtering."""
+        include_archived: bool = False,
+        projection_model: Optional[Type[BaseModel]] = None
+    ) -> Tuple[List[Union[Message, BaseModel]], Optional[str]]:
+        """Get messages for a conversation with filtering, newest first.
+        
+        Pages are addressed with keyset cursors (see `encode_cursor`) instead
+        of skip, so every page is an index seek on
+        (conversation_id, created_at, message_id). With a
+        `projection_model` (e.g. MessageSummary), MongoDB returns only that
+        model's fields.
+        
+        Returns:
+            The page and the cursor of the next one, or None on the last page
+        
+        Raises:
+            ValidationError: If the cursor is malformed
+        """
+        filters = self._conversation_filters(conversation_id, role, start_date, end_date)
+        
+        # Resume after the last message of the previous page
+        if cursor:
+            filters.append(_after_cursor(cursor))
+        
         try:
-            # Build query
-            query = Message.conversation_id == conversation_id
-            
-            # Add role filter
-            if role:
-                query = query & (Message.role == role.value)
-            
-            # Add date range filter
-            if start_date:
-                query = query & (Message.timestamps['created_at'] >= start_date)
-            if end_date:
-                query = query & (Message.timestamps['created_at'] <= end_date)
-            
-            # Add status filter - simplified since we removed status field
-            
-            # Execute query with pagination and sorting
-            messages = await Message.find(query)\
-                .sort(-Message.timestamps['created_at'])\
-                .skip(skip)\
-                .limit(limit)\
+            # Execute query with keyset pagination and sorting; one extra row
+            # tells whether another page follows
+            messages = await Message.find(*filters, projection_model=projection_model)\
+                .sort(-Message.created_at, -Message.message_id)\
+                .limit(limit + 1)\
                 .to_list()
             
             logger.info(
                 "Retrieved conversation messages", 
                 conversation_id=conversation_id,
-                count=len(messages)
+                count=min(len(messages), limit)
             )
-            return messages
+            return _page(messages, limit)
             
         except Exception as e:
             logger.error(
@@ -96,6 +211,61 @@ class MessageRepository:
             )
             raise DatabaseError("get_conversation_messages", f"Failed to get messages: {str(e)}")
 
+    async def get_conversation_turns(self, conversation_id: str, limit: int = 50) -> List[Dict[str, Any]]:
+        """Get the newest messages of a conversation as raw prompt turns.
+        
+        Returns plain dicts with only `message_id`, `role` and `text`, newest
+        first; documents are projected by MongoDB and not validated into
+        models, since they only feed an LLM prompt.
+        """
+        try:
+            turns = await Message.find(Message.conversation_id == conversation_id).aggregate([
+                {"$sort": {"created_at": -1, "message_id": -1}},
+                {"$limit": limit},
+                {"$project": _TURN_PROJECTION}
+            ]).to_list()
+            
+            if DEBUG_ENABLED:
+                logger.debug("Retrieved conversation turns", conversation_id=conversation_id, count=len(turns))
+            return turns
+            
+        except Exception as e:
+            logger.error(
+                "Failed to get conversation turns",
+                conversation_id=conversation_id,
+                error=str(e)
+            )
+            raise DatabaseError("get_conversation_turns", f"Failed to get messages: {str(e)}")
+
+    async def get_latest_message_id(
+        self,
+        conversation_id: str,
+        exclude_message_id: Optional[str] = None
+    ) -> Optional[str]:
+        """Get the ID of a conversation's newest message, optionally skipping one.
+        
+        Only the (conversation_id, created_at, message_id) index is read.
+        """
+        query: Dict[str, Any] = {"conversation_id": conversation_id}
+        if exclude_message_id:
+            query["message_id"] = {"$ne": exclude_message_id}
+        
+        try:
+            newest = await Message.find(query).aggregate([
+                {"$sort": {"created_at": -1, "message_id": -1}},
+                {"$limit": 1},
+                {"$project": {"_id": 0, "message_id": 1}}
+            ]).to_list()
+            return newest[0]["message_id"] if newest else None
+            
+        except Exception as e:
+            logger.error(
+                "Failed to get latest message",
+                conversation_id=conversation_id,
+                error=str(e)
+            )
+            raise DatabaseError("get_latest_message_id", f"Failed to get messages: {str(e)}")
+
     async def count_conversation_messages(
         self,
         conversation_id: str,
@@ -104,14 +274,8 @@ class MessageRepository:
     ) -> int:
         """Count messages in a conversation."""
         try:
-            query = Message.conversation_id == conversation_id
-            
-            if role:
-                query = query & (Message.role == role.value)
-            
-            # Add status filter - simplified since we removed status field
-            
-            count = await Message.find(query).count()
+            filters = self._conversation_filters(conversation_id, role)
+            count = await Message.find(*filters).count()
             return count
             
         except Exception as e:
@@ -128,18 +292,25 @@ class MessageRepository:
         self,
         user_id: str,
         limit: int = 50,
-        skip: int = 0
-    ) -> List[Message]:
-        """Get messages for a user."""
+        cursor: Optional[str] = None
+    ) -> Tuple[List[Message], Optional[str]]:
+        """Get messages for a user, newest first, using keyset cursors.
+        
+        Returns:
+            The page and the cursor of the next one, or None on the last page
+        """
+        filters = [Message.user_id == user_id]
+        if cursor:
+            filters.append(_after_cursor(cursor))
+        
         try:
-            messages = await Message.find(Message.user_id == user_id)\
-                .sort(-Message.timestamps['created_at'])\
-                .skip(skip)\
-                .limit(limit)\
+            messages = await Message.find(*filters)\
+                .sort(-Message.created_at, -Message.message_id)\
+                .limit(limit + 1)\
                 .to_list()
             
-            logger.info("Retrieved user messages", user_id=user_id, count=len(messages))
-            return messages
+            logger.info("Retrieved user messages", user_id=user_id, count=min(len(messages), limit))
+            return _page(messages, limit)
             
         except Exception as e:
             logger.error("Failed to get user messages", user_id=user_id, error=str(e))
@@ -152,10 +323,19 @@ class MessageRepository:
         user_id: Optional[str] = None,
         limit: int = 50
     ) -> List[Message]:
-        """Basic text search in messages."""
+        """Basic text search in messages.
+        
+        Queries shorter than `PREFIX_SEARCH_MAX_LENGTH` characters are matched
+        as a case-insensitive prefix of the message text, which skips the
+        tokenized text-index lookup; longer ones use the text index.
+        """
         try:
             # Build search query
-            search_filter = {"$text": {"$search": query}}
+            term = query.strip()
+            if len(term) < PREFIX_SEARCH_MAX_LENGTH:
+                search_filter = {"text": {"$regex": f"^{re.escape(term)}", "$options": "i"}}
+            else:
+                search_filter = {"$text": {"$search": term}}
             
             if conversation_id:
                 search_filter["conversation_id"] = conversation_id
@@ -1,46 +1,148 @@
 """LLM service for integration with external LLM services."""
 
 import asyncio
+import random
 import time
-from typing import Dict, List, Any, Optional
-from urllib3.util.retry import Retry
+from email.utils import parsedate_to_datetime
+from hashlib import sha256
+from typing import AsyncIterator, Dict, List, Any, Optional
 import httpx
+import msgspec
+import orjson
 from httpx import Timeout
 
+from app.core.cache import llm_cache
 from app.core.config import settings
 from app.core.exceptions import LLMError, ValidationError, TimeoutError
-from app.core.logging import get_logger
+from app.core.logging import get_logger, DEBUG_ENABLED
+from app.core.metrics import (
+    LLM_CACHED_TOKENS,
+    LLM_PROCESSING_TIME,
+    LLM_REQUEST_TIME,
+    LLM_TOKENS_USED,
+)
 
 logger = get_logger(__name__)
 
 
+class LLMRequest(msgspec.Struct, omit_defaults=True):
+    """Request body sent to the LLM service."""
+    model: str
+    messages: List[Dict[str, str]]
+    temperature: float
+    max_tokens: int
+    stream: bool
+    top_p: Optional[float] = None
+
+
+class _PromptTokensDetails(msgspec.Struct):
+    cached_tokens: int = 0
+
+
+class _Usage(msgspec.Struct):
+    prompt_tokens_details: Optional[_PromptTokensDetails] = None
+
+
+class LLMResponseSchema(msgspec.Struct):
+    """Response body of the LLM service; unknown fields are ignored."""
+    response: str
+    model: str
+    tokens_used: int = 0
+    processing_time: float = 0.0
+    correlation_id: str = "unknown"
+    usage: Optional[_Usage] = None
+
+
+LLM_REQUEST_ENCODER = msgspec.json.Encoder()
+LLM_RESPONSE_DECODER = msgspec.json.Decoder(LLMResponseSchema)
+
+
 class LLMMessage:
     """Represents a message in LLM conversation format."""
     
+    __slots__ = ("role", "content", "_dict")
+    
     def __init__(self, role: str, content: str):
         self.role = role
         self.content = content
+        # Built once; history messages are serialized on every turn
+        self._dict = {"role": role, "content": content}
         
     def to_dict(self) -> Dict[str, str]:
-        return {"role": self.role, "content": self.content}
+        return self._dict
 
 
 class LLMResponse:
     """Response from LLM service."""
     
+    __slots__ = (
+        "response", "model", "tokens_used", "processing_time", "correlation_id", "cached_tokens"
+    )
+    
     def __init__(
         self,
         response: str,
         model: str,
         tokens_used: int,
         processing_time: float,
-        correlation_id: str
+        correlation_id: str,
+        cached_tokens: int = 0
     ):
         self.response = response
         self.model = model
         self.tokens_used = tokens_used
         self.processing_time = processing_time
         self.correlation_id = correlation_id
+        # Prompt tokens served from the provider's prompt cache
+        self.cached_tokens = cached_tokens
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "response": self.response,
+            "model": self.model,
+            "tokens_used": self.tokens_used,
+            "processing_time": self.processing_time,
+            "correlation_id": self.correlation_id,
+            "cached_tokens": self.cached_tokens
+        }
+
+
+class RetryBackoff:
+    """Exponential backoff with jitter for upstream retries.
+    
+    Delays double per attempt up to `max_delay` and are scaled by a random
+    factor in [0.5, 1.5) so concurrent clients do not retry in lockstep.
+    """
+    
+    __slots__ = ("base_delay", "max_delay")
+    
+    def __init__(self, base_delay: float = 1.0, max_delay: float = 30.0):
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+    
+    def delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Seconds to wait before retry `attempt` (0-based), at least `retry_after`."""
+        delay = min(self.max_delay, self.base_delay * (2 ** attempt)) * random.uniform(0.5, 1.5)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+    
+    @staticmethod
+    def retry_after(response: httpx.Response) -> Optional[float]:
+        """Parse a Retry-After header given in seconds or as an HTTP date."""
+        value = response.headers.get("Retry-After")
+        if not value:
+            return None
+        
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
 
 
 class LLMService:
@@ -50,16 +152,26 @@ class LLMService:
         self.base_url = settings.llm_service_url
         self.timeout = Timeout(settings.request_timeout_seconds)
         self.max_retries = 3
-        self.base_delay = 1.0
+        self.backoff = RetryBackoff(base_delay=1.0, max_delay=30.0)
         
-        # Configure HTTP client with connection pooling and retries
+        # Configure HTTP client with connection pooling; retries are handled
+        # in send_message, so the transport never retries on its own
+        # (limits belong to the transport once one is passed explicitly)
         self.client = httpx.AsyncClient(
             timeout=self.timeout,
-            limits=httpx.Limits(
-                max_keepalive_connections=20,
-                max_connections=100
+            transport=httpx.AsyncHTTPTransport(
+                limits=httpx.Limits(
+                    max_keepalive_connections=100,
+                    max_connections=1000,
+                    keepalive_expiry=30.0
+                ),
+                retries=0
             )
         )
+        
+        # Bounds concurrent upstream calls; identical deterministic payloads are coalesced
+        self._semaphore = asyncio.Semaphore(settings.max_concurrent_llm_requests)
+        self._inflight: Dict[bytes, "asyncio.Task[LLMResponse]"] = {}
     
     async def send_message(
         self,
@@ -89,53 +201,87 @@ class LLMService:
         """
         start_time = time.time()
         
-        # Validate input
-        if not messages:
-            raise ValidationError("Messages list cannot be empty", field="messages")
+        request = self._build_payload(messages, model, temperature, max_tokens, top_p, stream=False)
+        # Encoded once: the same bytes are the request body and the cache and
+        # coalescing keys (struct fields always encode in the same order)
+        body = self._encode_payload(request)
         
-        if len(messages) > 100:  # Reasonable limit
-            raise ValidationError("Too many messages in conversation", field="messages")
+        # Deterministic requests are answered from the cache when possible
+        cache_key = llm_cache.cache_key(body, request.temperature) if settings.llm_cache_enabled else None
+        if cache_key:
+            cached = await llm_cache.get(cache_key)
+            if cached is not None:
+                if DEBUG_ENABLED:
+                    logger.debug(
+                        "LLM response served from cache",
+                        model=request.model,
+                        hit_rate=round(llm_cache.hit_rate, 3)
+                    )
+                return LLMResponse(**cached)
         
-        # Prepare payload
-        payload = {
-            "model": model or settings.default_model,
-            "messages": [msg.to_dict() for msg in messages],
-            "temperature": temperature if temperature is not None else settings.default_temperature,
-            "max_tokens": max_tokens or settings.max_tokens_per_request,
-            "stream": False  # Not implemented yet according to docs
-        }
+        if DEBUG_ENABLED:
+            logger.debug(
+                "Sending message to LLM",
+                model=request.model,
+                message_count=len(messages),
+                max_tokens=request.max_tokens
+            )
         
-        if top_p is not None:
-            payload["top_p"] = top_p
+        # At a non-zero temperature every caller is owed its own sample
+        if request.temperature != 0:
+            return await self._send_with_retries(body, start_time, cache_key)
         
-        logger.info(
-            "Sending message to LLM",
-            model=payload["model"],
-            message_count=len(messages),
-            max_tokens=payload["max_tokens"]
-        )
+        # Identical deterministic requests already in flight share one upstream call
+        request_key = sha256(body).digest()
+        task = self._inflight.get(request_key)
+        if task is None:
+            task = asyncio.create_task(self._send_with_retries(body, start_time, cache_key))
+            self._inflight[request_key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(request_key, None))
+        elif DEBUG_ENABLED:
+            logger.debug("Joining in-flight LLM request", model=request.model)
         
+        # Shielded so a cancelled caller does not cancel the shared request
+        return await asyncio.shield(task)
+    
+    async def _send_with_retries(
+        self,
+        body: bytes,
+        start_time: float,
+        cache_key: Optional[str]
+    ) -> LLMResponse:
+        """Send an encoded request to the LLM service, retrying timeouts and rate limits."""
         # Send with retry logic
         for attempt in range(self.max_retries + 1):
             try:
-                response = await self._make_request(payload)
+                async with self._semaphore:
+                    response = await self._make_request(body)
                 
                 if response:
                     total_time = time.time() - start_time
-                    logger.info(
-                        "LLM response received",
-                        correlation_id=response.correlation_id,
-                        tokens_used=response.tokens_used,
-                        processing_time=response.processing_time,
-                        total_time=total_time
-                    )
+                    LLM_TOKENS_USED.labels(response.model).inc(response.tokens_used)
+                    LLM_CACHED_TOKENS.labels(response.model).inc(response.cached_tokens)
+                    LLM_PROCESSING_TIME.labels(response.model).observe(response.processing_time)
+                    LLM_REQUEST_TIME.labels(response.model).observe(total_time)
+                    
+                    if DEBUG_ENABLED:
+                        logger.debug(
+                            "LLM response received",
+                            correlation_id=response.correlation_id,
+                            tokens_used=response.tokens_used,
+                            cached_tokens=response.cached_tokens,
+                            processing_time=response.processing_time,
+                            total_time=total_time
+                        )
+                    if cache_key:
+                        await llm_cache.set(cache_key, response.to_dict())
                     return response
                     
             except httpx.TimeoutException:
                 if attempt < self.max_retries:
-                    delay = self.base_delay * (2 ** attempt)
+                    delay = self.backoff.delay(attempt)
                     logger.warning(
-                        f"LLM request timeout, retrying in {delay}s",
+                        f"LLM request timeout, retrying in {delay:.2f}s",
                         attempt=attempt + 1,
                         max_retries=self.max_retries
                     )
@@ -146,11 +292,16 @@ class LLMService:
                     
             except httpx.HTTPStatusError as e:
                 if e.response.status_code == 429:  # Rate limit
-                    if attempt < self.max_retries:
-                        delay = self.base_delay * (2 ** attempt)
+                    retry_after = self.backoff.retry_after(e.response)
+                    # A Retry-After beyond the backoff cap is not waited out in-request
+                    if attempt < self.max_retries and (
+                        retry_after is None or retry_after <= self.backoff.max_delay
+                    ):
+                        delay = self.backoff.delay(attempt, retry_after)
                         logger.warning(
-                            f"Rate limit exceeded, retrying in {delay}s",
-                            attempt=attempt + 1
+                            f"Rate limit exceeded, retrying in {delay:.2f}s",
+                            attempt=attempt + 1,
+                            retry_after=retry_after
                         )
                         await asyncio.sleep(delay)
                         continue
@@ -161,10 +312,12 @@ class LLMService:
                         )
                 elif e.response.status_code == 408:  # Timeout
                     if attempt < self.max_retries:
+                        delay = self.backoff.delay(attempt)
                         logger.warning(
-                            f"LLM service timeout, retrying",
+                            f"LLM service timeout, retrying in {delay:.2f}s",
                             attempt=attempt + 1
                         )
+                        await asyncio.sleep(delay)
                         continue
                     else:
                         raise LLMError(
@@ -195,32 +348,165 @@ class LLMService:
             error_code="LLM_MAX_RETRIES_EXCEEDED"
         )
     
-    async def _make_request(self, payload: Dict[str, Any]) -> Optional[LLMResponse]:
+    async def stream_message(
+        self,
+        messages: List[LLMMessage],
+        model: Optional[str] = None,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        top_p: Optional[float] = None
+    ) -> AsyncIterator[str]:
+        """
+        Stream a response from the LLM service as it is generated.
+        
+        The upstream response is read as Server-Sent Events and each text
+        delta is yielded as soon as it arrives. No retries are attempted
+        once the stream has started.
+        
+        Yields:
+            Text fragments of the assistant response
+            
+        Raises:
+            LLMError: For LLM-related errors
+            ValidationError: For input validation errors
+            TimeoutError: For timeout errors
+        """
+        request = self._build_payload(messages, model, temperature, max_tokens, top_p, stream=True)
+        body = self._encode_payload(request)
+        url = f"{self.base_url}/llm/message"
+        
+        if DEBUG_ENABLED:
+            logger.debug(
+                "Streaming message from LLM",
+                model=request.model,
+                message_count=len(messages),
+                max_tokens=request.max_tokens
+            )
+        
+        try:
+            async with self.client.stream(
+                "POST",
+                url,
+                content=body,
+                headers={"Content-Type": "application/json"}
+            ) as response:
+                if response.is_error:
+                    await response.aread()
+                    error_detail = await self._extract_error_detail(response)
+                    raise LLMError(
+                        f"LLM service error: {error_detail}",
+                        error_code="LLM_SERVICE_ERROR"
+                    )
+                
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    
+                    data = line[5:].strip()
+                    if data == "[DONE]":
+                        break
+                    
+                    delta = self._extract_stream_delta(orjson.loads(data))
+                    if delta:
+                        yield delta
+                        
+        except httpx.TimeoutException:
+            raise TimeoutError("LLM stream timed out")
+        except httpx.ConnectError:
+            raise LLMError(
+                "Could not connect to LLM service",
+                error_code="LLM_CONNECTION_ERROR"
+            )
+        except httpx.HTTPError as e:
+            # E.g. the connection dropping mid-stream
+            raise LLMError(
+                f"LLM stream failed: {str(e)}",
+                error_code="LLM_STREAM_ERROR"
+            )
+        except orjson.JSONDecodeError as e:
+            raise LLMError(
+                f"Invalid LLM stream chunk: {str(e)}",
+                error_code="LLM_STREAM_ERROR"
+            )
+    
+    def _build_payload(
+        self,
+        messages: List[LLMMessage],
+        model: Optional[str],
+        temperature: Optional[float],
+        max_tokens: Optional[int],
+        top_p: Optional[float],
+        stream: bool
+    ) -> LLMRequest:
+        """Validate messages and build the LLM request payload."""
+        # Validate input
+        if not messages:
+            raise ValidationError("Messages list cannot be empty", field="messages")
+        
+        if len(messages) > 100:  # Reasonable limit
+            raise ValidationError("Too many messages in conversation", field="messages")
+        
+        # top_p is omitted from the body when unset
+        return LLMRequest(
+            model=model or settings.default_model,
+            messages=[msg.to_dict() for msg in messages],
+            temperature=temperature if temperature is not None else settings.default_temperature,
+            max_tokens=max_tokens or settings.max_tokens_per_request,
+            stream=stream,
+            top_p=top_p
+        )
+    
+    def _encode_payload(self, request: LLMRequest) -> bytes:
+        """Encode the request body, rejecting it if it is too large to send.
+        
+        Checked before any attempt is made, so an oversized conversation
+        fails fast instead of going through the retry loop.
+        """
+        body = LLM_REQUEST_ENCODER.encode(request)
+        if len(body) > settings.max_llm_payload_bytes:
+            raise ValidationError(
+                f"LLM request payload exceeds maximum size of {settings.max_llm_payload_bytes} bytes",
+                field="messages"
+            )
+        return body
+    
+    def _extract_stream_delta(self, chunk: Dict[str, Any]) -> Optional[str]:
+        """Extract the text delta from a streamed chunk."""
+        # OpenAI-compatible chunk format
+        choices = chunk.get("choices")
+        if choices:
+            return choices[0].get("delta", {}).get("content")
+        
+        return chunk.get("delta") or chunk.get("response")
+    
+    async def _make_request(self, body: bytes) -> Optional[LLMResponse]:
         """Make HTTP request to LLM service."""
         url = f"{self.base_url}/llm/message"
         
         response = await self.client.post(
             url,
-            json=payload,
+            content=body,
             headers={"Content-Type": "application/json"}
         )
         
         response.raise_for_status()
         
-        data = response.json()
+        data = LLM_RESPONSE_DECODER.decode(response.content)
+        details = data.usage.prompt_tokens_details if data.usage else None
         
         return LLMResponse(
-            response=data["response"],
-            model=data["model"],
-            tokens_used=data.get("tokens_used", 0),
-            processing_time=data.get("processing_time", 0.0),
-            correlation_id=data.get("correlation_id", "unknown")
+            response=data.response,
+            model=data.model,
+            tokens_used=data.tokens_used,
+            processing_time=data.processing_time,
+            correlation_id=data.correlation_id,
+            cached_tokens=details.cached_tokens if details else 0
         )
     
     async def _extract_error_detail(self, response: httpx.Response) -> str:
         """Extract error detail from response."""
         try:
-            error_data = response.json()
+            error_data = orjson.loads(response.content)
             return error_data.get("detail", f"HTTP {response.status_code}")
         except:
             return f"HTTP {response.status_code}"
@@ -315,4 +601,8 @@ class LLMConversation:
         return "\n".join([
             f"{msg.role.title()}: {msg.content}"
             for msg in self.messages
-        ])
\ No newline at end of file
+        ])
+
+
+# Shared instance so every request reuses one HTTP connection pool
+llm_service = LLMService()
@@ -1,31 +1,156 @@
 """Message service for business logic."""
 
+import asyncio
+import html
+import re
+from collections import OrderedDict, deque
 from datetime import datetime
-from typing import List, Optional, Dict, Any
+from typing import AsyncIterator, Awaitable, Callable, Coroutine, Deque, List, Optional, Dict, Any, Set, Tuple
 import bleach
+import httpx
 
 from app.repositories.message_repository import MessageRepository
-from app.models.database import Message
+from app.models.database import Message, MessageSummary
 from app.models.message import (
     CreateMessageRequest, 
     MessageResponse, 
     ConversationMessagesRequest,
-    MessageRole
+    MessagePage,
+    MessageRole,
+    MESSAGE_LIST_ADAPTER
+)
+from app.core.exceptions import (
+    MessageServiceException,
+    ValidationError,
+    NotFoundError,
+    LLMError,
+    DatabaseError
 )
-from app.core.exceptions import ValidationError, NotFoundError, LLMError
 from app.core.logging import get_logger
 from app.core.config import settings
-from app.services.llm_service import LLMService, LLMMessage
+from app.services.llm_service import LLMService, LLMMessage, llm_service
 
 logger = get_logger(__name__)
 
+# Anything bleach would treat as more than plain text: a tag, comment or
+# processing instruction opener, a possible character reference, or a control
+# character bleach replaces. Content without any of these only needs escaping.
+_MARKUP_RE = re.compile(r"<[A-Za-z/!?]|&[#A-Za-z]|[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+
+class ConversationHistory:
+    """Recent LLM context per conversation, kept in process memory.
+    
+    Each conversation holds up to its last `max_messages` messages as
+    (message_id, LLMMessage) pairs in chronological order; conversations are
+    kept in LRU order and capped at `max_conversations`. A conversation is
+    only appended to once it has been loaded from the database, so a partial
+    history is never served.
+    
+    Other workers write to the same conversations, so a buffered history is
+    checked against the newest stored message before use (see
+    `MessageService._history_before`) and read again when it is behind.
+    
+    A full history is trimmed by dropping its oldest `trim_messages` at once
+    rather than one message per turn, so between trims the history (and so
+    the prompt prefix sent to the LLM) only grows at the end and provider
+    prompt caches keep matching.
+    """
+    
+    def __init__(self, max_conversations: int = 10_000, max_messages: int = 50, trim_messages: int = 20):
+        self._conversations: "OrderedDict[str, Deque[Tuple[str, LLMMessage]]]" = OrderedDict()
+        self.max_conversations = max_conversations
+        self.max_messages = max_messages
+        self.trim_messages = trim_messages
+    
+    def get(self, conversation_id: str) -> Optional[List[Tuple[str, LLMMessage]]]:
+        """Get a conversation's history, or None if it is not loaded."""
+        history = self._conversations.get(conversation_id)
+        if history is None:
+            return None
+        
+        self._conversations.move_to_end(conversation_id)
+        return list(history)
+    
+    def load(self, conversation_id: str, messages: List[Tuple[str, LLMMessage]]) -> None:
+        """Replace a conversation's history with `messages` (chronological)."""
+        history = deque(messages)
+        self._trim(history)
+        self._conversations[conversation_id] = history
+        self._conversations.move_to_end(conversation_id)
+        if len(self._conversations) > self.max_conversations:
+            self._conversations.popitem(last=False)
+    
+    def append(self, conversation_id: str, message_id: str, message: LLMMessage) -> None:
+        """Append a message to a loaded conversation; no-op otherwise."""
+        history = self._conversations.get(conversation_id)
+        if history is not None:
+            history.append((message_id, message))
+            self._trim(history)
+    
+    def discard(self, conversation_id: str) -> None:
+        """Forget a conversation, so its history is read again on next use."""
+        self._conversations.pop(conversation_id, None)
+    
+    def _trim(self, history: Deque[Tuple[str, LLMMessage]]) -> None:
+        if len(history) <= self.max_messages:
+            return
+        
+        # Drop at least trim_messages, and enough to get back under the cap
+        for _ in range(max(self.trim_messages, len(history) - self.max_messages)):
+            history.popleft()
+
+
+conversation_history = ConversationHistory()
+
+
+class PendingWrites:
+    """Database writes that run after the response has been returned.
+    
+    Failures are logged, since no caller is waiting on them; `drain` lets
+    shutdown wait for outstanding writes so none are lost.
+    """
+    
+    def __init__(self):
+        self._tasks: Set[asyncio.Task] = set()
+    
+    def spawn(self, write: Coroutine[Any, Any, Any]) -> asyncio.Task:
+        """Run a write in the background and track it until it finishes."""
+        task = asyncio.create_task(write)
+        self._tasks.add(task)
+        task.add_done_callback(self._done)
+        return task
+    
+    def _done(self, task: asyncio.Task) -> None:
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Background write failed", error=str(task.exception()))
+    
+    async def drain(self) -> None:
+        """Wait for all outstanding writes."""
+        if self._tasks:
+            logger.info("Waiting for pending writes", count=len(self._tasks))
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+pending_writes = PendingWrites()
+
+
+def _needs_bleach(content: str) -> bool:
+    """Whether content has markup, so escaping alone would not match bleach."""
+    return _MARKUP_RE.search(content) is not None
+
+
+def _llm_role(role: MessageRole) -> str:
+    return "user" if role == MessageRole.USER else "assistant"
+
 
 class MessageService:
     """Service for message operations."""
     
-    def __init__(self):
+    def __init__(self, llm: Optional[LLMService] = None):
         self.repository = MessageRepository()
-        self.llm_service = LLMService()
+        self.llm_service = llm or llm_service
     
     
     async def create_message(
@@ -41,15 +166,7 @@ class MessageService:
             user_id=user_id
         )
         
-        # Sanitize content
-        sanitized_content = self._sanitize_content(request.content)
-        
-        # Validate content length
-        if len(sanitized_content) > settings.max_message_length:
-            raise ValidationError(
-                f"Message content exceeds maximum length of {settings.max_message_length} characters",
-                field="content"
-            )
+        sanitized_content = await self._validated_content(request)
         
         # Create message in database
         message = await self.repository.create_message(
@@ -60,50 +177,101 @@ class MessageService:
             character_id=character_id,
             metadata=request.metadata
         )
+        conversation_history.append(request.conversation_id, message.message_id, LLMMessage("user", message.text))
         
         return self._to_response_model(message)
     
+    async def _validated_content(self, request: CreateMessageRequest) -> str:
+        """Sanitize a message's content and check its length.
+        
+        Raises:
+            ValidationError: If the sanitized content is too long
+        """
+        sanitized_content = await self._sanitize_content_async(request.content)
+        
+        if len(sanitized_content) > settings.max_message_length:
+            raise ValidationError(
+                f"Message content exceeds maximum length of {settings.max_message_length} characters",
+                field="content"
+            )
+        return sanitized_content
+    
+    async def _insert_message(self, message: Message) -> Message:
+        """Insert a message that is already in use before its write completes.
+        
+        If the insert fails, the buffered history that may hold the message
+        is dropped, so the unsaved message is not served again.
+        """
+        try:
+            return await self.repository.insert_message(message)
+        except Exception:
+            conversation_history.discard(message.conversation_id)
+            raise
+    
     async def get_conversation_messages(
         self,
         conversation_id: str,
         request: ConversationMessagesRequest
-    ) -> List[MessageResponse]:
-        """Get messages for a conversation."""
+    ) -> MessagePage:
+        """Get a page of messages for a conversation, newest first.
+        
+        `next_cursor` resumes after the page's last message; it is None on
+        the last page.
+        """
         logger.info(
             "Getting conversation messages",
             conversation_id=conversation_id,
             limit=request.limit
         )
         
-        messages = await self.repository.get_conversation_messages(
+        messages, next_cursor = await self.repository.get_conversation_messages(
             conversation_id=conversation_id,
             limit=request.limit,
-            skip=0,  # TODO: Implement cursor-based pagination
+            cursor=request.cursor,
             role=request.role,
             start_date=request.start_date,
             end_date=request.end_date,
-            include_archived=request.include_archived
+            include_archived=request.include_archived,
+            projection_model=None if request.include_metadata else MessageSummary
         )
         
-        return [self._to_response_model(msg) for msg in messages]
+        return MessagePage(messages=self._to_response_models(messages), next_cursor=next_cursor)
 
     
     
     def _sanitize_content(self, content: str) -> str:
-        """Sanitize message content."""
-        # Basic HTML sanitization
-        sanitized = bleach.clean(
-            content,
-            tags=[],  # Remove all HTML tags
-            attributes={},  # Remove all attributes
-            strip=True
-        )
+        """Sanitize message content.
+        
+        Strips all HTML tags and collapses whitespace; the result is
+        HTML-escaped text. Content with markup goes through bleach; plain
+        text (including bare `<`, `>` and `&`) is only escaped, which gives
+        the same result as bleach without parsing.
+        """
+        if _needs_bleach(content):
+            sanitized = bleach.clean(
+                content,
+                tags=[],  # Remove all HTML tags
+                attributes={},  # Remove all attributes
+                strip=True
+            )
+        else:
+            sanitized = html.escape(content, quote=False)
         
         # Remove extra whitespace
         sanitized = ' '.join(sanitized.split())
         
         return sanitized
     
+    async def _sanitize_content_async(self, content: str) -> str:
+        """Sanitize message content without blocking the event loop on bleach.
+        
+        Plain text is escaped inline in microseconds; content that needs
+        bleach is sanitized in a worker thread.
+        """
+        if _needs_bleach(content):
+            return await asyncio.to_thread(self._sanitize_content, content)
+        return self._sanitize_content(content)
+    
     async def process_message_with_llm(
         self,
         request: CreateMessageRequest,
@@ -126,43 +294,27 @@ class MessageService:
             character_id=character_id
         )
         
-        # Create user message
-        user_message = await self.create_message(request, user_id, character_id)
+        sanitized_content = await self._validated_content(request)
+        
+        # Insert the user message while the history is read; the insert is
+        # awaited before the history is recorded or the LLM is called, so a
+        # failed write fails the request without leaving the message buffered
+        message = self.repository.build_message(
+            conversation_id=request.conversation_id,
+            user_id=user_id,
+            content=sanitized_content,
+            role=MessageRole.USER,
+            character_id=character_id,
+            metadata=request.metadata
+        )
+        user_message = self._to_response_model(message)
+        user_write = asyncio.ensure_future(self._insert_message(message))
         
         try:
             # Build LLM conversation
-            llm_messages = []
-            
-            # Add system prompt if provided
-            if system_prompt:
-                llm_messages.append(LLMMessage("system", system_prompt))
-            
-            # Try to get conversation history for context, but don't fail if it doesn't work
-            try:
-                conversation_messages = await self.get_conversation_messages(
-                    conversation_id=request.conversation_id,
-                    request=ConversationMessagesRequest(limit=50)  # Last 50 messages for context
-                )
-                
-                # Add conversation history (exclude the just-created message)
-                for msg in conversation_messages[:-1]:  # Exclude the just-created message
-                    role = "user" if msg.role == MessageRole.USER else "assistant"
-                    llm_messages.append(LLMMessage(role, msg.content["text"]))
-                    
-                logger.info(
-                    "Added conversation history",
-                    conversation_id=request.conversation_id,
-                    history_count=len(conversation_messages) - 1
-                )
-            except Exception as e:
-                logger.warning(
-                    "Failed to get conversation history, proceeding without context",
-                    conversation_id=request.conversation_id,
-                    error=str(e)
-                )
-            
-            # Add current user message
-            llm_messages.append(LLMMessage("user", request.content))
+            llm_messages = await self._build_llm_messages(
+                request, user_message, system_prompt, stored=user_write
+            )
             
             # Send to LLM
             llm_response = await self.llm_service.send_message(
@@ -171,8 +323,9 @@ class MessageService:
                 temperature=temperature
             )
             
-            # Create assistant message with LLM response
-            assistant_message = await self.repository.create_message(
+            # Build the assistant message and persist it in the background, so
+            # the write is not on the response path
+            assistant_message = self.repository.build_message(
                 conversation_id=request.conversation_id,
                 user_id="assistant",  # Special user ID for assistant
                 content=llm_response.response,
@@ -186,10 +339,18 @@ class MessageService:
                     },
                     "token_usage": {
                         "tokens_used": llm_response.tokens_used,
+                        "cached_tokens": llm_response.cached_tokens,
                         "model": llm_response.model
                     }
                 }
             )
+            assistant_response = self._to_response_model(assistant_message)
+            pending_writes.spawn(self._insert_message(assistant_message))
+            conversation_history.append(
+                request.conversation_id,
+                assistant_message.message_id,
+                LLMMessage("assistant", assistant_message.text)
+            )
             
             logger.info(
                 "LLM processing completed",
@@ -200,9 +361,17 @@ class MessageService:
             
             return {
                 "user_message": user_message,
-                "assistant_message": self._to_response_model(assistant_message)
+                "assistant_message": assistant_response
             }
             
+        except DatabaseError:
+            conversation_history.discard(request.conversation_id)
+            raise
+        except ValidationError:
+            # E.g. the conversation is too large to send; as when the LLM call
+            # fails, the user message is still stored
+            await user_write
+            raise
         except LLMError as e:
             logger.error(
                 "LLM processing failed",
@@ -210,6 +379,7 @@ class MessageService:
                 error_code=e.code,
                 conversation_id=request.conversation_id
             )
+            await user_write
             # Return just the user message if LLM fails
             return {
                 "user_message": user_message,
@@ -225,6 +395,7 @@ class MessageService:
                 error=str(e),
                 conversation_id=request.conversation_id
             )
+            await user_write
             return {
                 "user_message": user_message,
                 "assistant_message": None,
@@ -234,11 +405,218 @@ class MessageService:
                 }
             }
     
+    async def stream_llm(
+        self,
+        request: CreateMessageRequest,
+        user_message: MessageResponse,
+        character_id: Optional[str] = None,
+        system_prompt: Optional[str] = None,
+        model: Optional[str] = None,
+        temperature: Optional[float] = None,
+        is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream an LLM response for an already created user message.
+        
+        Yields event dicts with a 'type' key: 'user_message', 'delta' for each
+        text fragment, then 'assistant_message' once the concatenated response
+        has been persisted, or 'error' if the stream fails. If the stream fails
+        or the client disconnects mid-stream, the partial response is still
+        persisted, marked as not completed.
+        """
+        yield {"type": "user_message", "message": user_message.model_dump()}
+        
+        chunks: List[str] = []
+        disconnected = False
+        failed = False
+        
+        try:
+            llm_messages = await self._build_llm_messages(request, user_message, system_prompt)
+            
+            async for delta in self.llm_service.stream_message(
+                messages=llm_messages,
+                model=model,
+                temperature=temperature
+            ):
+                chunks.append(delta)
+                yield {"type": "delta", "content": delta}
+                
+                if is_disconnected and await is_disconnected():
+                    disconnected = True
+                    logger.info(
+                        "Client disconnected during LLM stream",
+                        conversation_id=request.conversation_id
+                    )
+                    break
+                    
+        except MessageServiceException as e:
+            failed = True
+            logger.error(
+                "LLM streaming failed",
+                error=str(e),
+                error_code=e.code,
+                conversation_id=request.conversation_id
+            )
+            yield {"type": "error", "error": {"message": str(e), "code": e.code}}
+        except httpx.HTTPError as e:
+            failed = True
+            logger.error(
+                "LLM streaming failed",
+                error=str(e),
+                conversation_id=request.conversation_id
+            )
+            yield {"type": "error", "error": {"message": "LLM stream failed", "code": "LLM_STREAM_ERROR"}}
+        
+        if not chunks:
+            return
+        
+        try:
+            assistant_message = await self.repository.create_message(
+                conversation_id=request.conversation_id,
+                user_id="assistant",  # Special user ID for assistant
+                content="".join(chunks),
+                role=MessageRole.ASSISTANT,
+                character_id=character_id,
+                metadata={
+                    "llm_metadata": {
+                        "model": model or settings.default_model,
+                        "streamed": True,
+                        "completed": not (disconnected or failed)
+                    }
+                }
+            )
+        except DatabaseError as e:
+            if not (disconnected or failed):
+                yield {"type": "error", "error": {"message": "Failed to store response", "code": e.code}}
+            return
+        conversation_history.append(
+            request.conversation_id,
+            assistant_message.message_id,
+            LLMMessage("assistant", assistant_message.text)
+        )
+        
+        if not (disconnected or failed):
+            yield {
+                "type": "assistant_message",
+                "message": self._to_response_model(assistant_message).model_dump()
+            }
+    
+    async def _fetch_history(self, conversation_id: str) -> Optional[List[Tuple[str, LLMMessage]]]:
+        """Read a conversation's recent messages, oldest first, with their IDs.
+        
+        Returns None if the read fails, so callers can proceed without context.
+        """
+        try:
+            newest_first = await self.repository.get_conversation_turns(
+                conversation_id, limit=conversation_history.max_messages
+            )
+        except Exception as e:
+            logger.warning(
+                "Failed to get conversation history, proceeding without context",
+                conversation_id=conversation_id,
+                error=str(e)
+            )
+            return None
+        
+        return [
+            (turn["message_id"], LLMMessage(_llm_role(turn["role"]), turn["text"]))
+            for turn in reversed(newest_first)
+        ]
+    
+    async def _history_before(
+        self,
+        conversation_id: str,
+        message_id: str
+    ) -> Optional[List[Tuple[str, LLMMessage]]]:
+        """Get a conversation's history up to, but excluding, `message_id`.
+        
+        The buffered history is used while it holds the newest stored message
+        other than `message_id`; otherwise another worker has written to the
+        conversation (or it was never loaded) and it is read again from the
+        database. Returns None if the history cannot be read.
+        """
+        buffered = conversation_history.get(conversation_id)
+        if buffered is not None:
+            known = [entry for entry in buffered if entry[0] != message_id]
+            try:
+                newest_id = await self.repository.get_latest_message_id(
+                    conversation_id, exclude_message_id=message_id
+                )
+            except Exception as e:
+                logger.warning(
+                    "Failed to check conversation history, using buffered context",
+                    conversation_id=conversation_id,
+                    error=str(e)
+                )
+                return known
+            
+            if newest_id is None:
+                if not known:
+                    return known
+            elif any(known_id == newest_id for known_id, _ in known):
+                return known
+        
+        rows = await self._fetch_history(conversation_id)
+        if rows is None:
+            return None
+        
+        history = [row for row in rows if row[0] != message_id]
+        logger.info(
+            "Loaded conversation history",
+            conversation_id=conversation_id,
+            history_count=len(history)
+        )
+        return history
+    
+    async def _build_llm_messages(
+        self,
+        request: CreateMessageRequest,
+        user_message: MessageResponse,
+        system_prompt: Optional[str] = None,
+        stored: Optional[Awaitable[Any]] = None
+    ) -> List[LLMMessage]:
+        """Build the LLM conversation from the system prompt and history.
+        
+        The history ends with `user_message`, the current message. It is
+        served from `conversation_history` while that is current and read
+        from the database otherwise.
+        
+        Args:
+            stored: The current message's insert, if still in flight; it is
+                awaited after the history is read and before the message is
+                added to `conversation_history`
+        
+        Raises:
+            DatabaseError: If the insert in `stored` fails
+        """
+        # Always lead with a system prompt: a stable prefix lets the provider
+        # reuse its prompt cache across turns
+        llm_messages = [LLMMessage("system", system_prompt or settings.default_system_prompt)]
+        current = LLMMessage("user", user_message.content)
+        
+        history = await self._history_before(request.conversation_id, user_message.message_id)
+        if stored is not None:
+            await stored
+        
+        if history is None:
+            conversation_history.discard(request.conversation_id)
+            llm_messages.append(current)
+            return llm_messages
+        
+        history.append((user_message.message_id, current))
+        conversation_history.load(request.conversation_id, history)
+        
+        llm_messages.extend(message for _, message in history)
+        return llm_messages
+    
     async def get_llm_health_status(self) -> Dict[str, Any]:
         """Get LLM service health status."""
         try:
-            is_healthy = await self.llm_service.health_check()
-            service_info = await self.llm_service.get_service_info()
+            # Independent probes; the pool runs them on separate connections
+            is_healthy, service_info = await asyncio.gather(
+                self.llm_service.health_check(),
+                self.llm_service.get_service_info()
+            )
             
             return {
                 "healthy": is_healthy,
@@ -254,29 +632,39 @@ class MessageService:
             }
     
     def _to_response_model(self, message: Message) -> MessageResponse:
-        """Convert database model to response model."""
-        # Extract basic content text
-        content_text = message.content.get('text', '') if isinstance(message.content, dict) else str(message.content)
-        
-        # Extract creation timestamp
-        created_at = message.timestamps.get('created_at') if isinstance(message.timestamps, dict) else message.timestamps.created_at
-        
-        # Extract LLM metadata if present
-        llm_metadata = None
-        if hasattr(message, 'llm_metadata') and message.llm_metadata:
-            if hasattr(message.llm_metadata, 'model_dump'):
-                llm_metadata = message.llm_metadata.model_dump()
-            else:
-                llm_metadata = message.llm_metadata
+        """Convert database model to response model.
         
+        Message and MessageSummary share the same flat layout, with
+        `llm_metadata` stored as a plain dict, so fields are read directly.
+        """
         return MessageResponse(
             message_id=message.message_id,
             conversation_id=message.conversation_id,
             user_id=message.user_id,
             character_id=message.character_id,
-            content=content_text,
-            role=MessageRole(message.role),
-            created_at=created_at,
-            llm_metadata=llm_metadata,
+            content=message.text,
+            role=message.role,
+            created_at=message.created_at,
+            llm_metadata=message.llm_metadata or None,
             custom_metadata=message.custom_metadata or {}
-        )
\ No newline at end of file
+        )
+    
+    def _to_response_models(self, messages: List[Message]) -> List[MessageResponse]:
+        """Convert a list of database models to response models in one validation pass."""
+        return MESSAGE_LIST_ADAPTER.validate_python([
+            {
+                "message_id": message.message_id,
+                "conversation_id": message.conversation_id,
+                "user_id": message.user_id,
+                "character_id": message.character_id,
+                "content": message.text,
+                "role": message.role,
+                "created_at": message.created_at,
+                "llm_metadata": message.llm_metadata or None,
+                "custom_metadata": message.custom_metadata or {}
+            }
+            for message in messages
+        ])
+
+
+message_service = MessageService()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""Script to move message text and timestamps out of nested dicts into top-level fields."""
+
+import asyncio
+from motor.motor_asyncio import AsyncIOMotorClient
+from app.core.config import settings
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Indexes keyed on the nested paths; recreated on the flat fields by setup_indexes.py
+# and the Message model's indexes
+LEGACY_INDEXES = [
+    "idx_conversation_chronological",
+    "idx_user_chronological",
+    "idx_temporal_pagination",
+    "idx_text_search",
+    "idx_analytics_queries",
+    "idx_safety_audit",
+]
+
+
+async def flatten_messages():
+    """Rewrite legacy messages in place and drop indexes on the old paths."""
+    
+    # Connect to MongoDB
+    client = AsyncIOMotorClient(settings.mongodb_url)
+    db = client[settings.mongodb_database]
+    messages_collection = db.messages
+    
+    logger.info("Flattening messages collection")
+    
+    try:
+        # Single server-side pass: no documents travel to the client
+        result = await messages_collection.update_many(
+            {"content": {"$exists": True}},
+            [
+                {"$set": {
+                    "text": "$content.text",
+                    "created_at": "$timestamps.created_at",
+                    "updated_at": "$timestamps.updated_at",
+                }},
+                {"$unset": ["content", "timestamps"]},
+            ]
+        )
+        logger.info("Flattened messages", modified=result.modified_count)
+        
+        existing = {idx["name"] async for idx in messages_collection.list_indexes()}
+        for name in LEGACY_INDEXES:
+            if name in existing:
+                await messages_collection.drop_index(name)
+                logger.info("Dropped legacy index", index=name)
+        
+    except Exception as e:
+        logger.error("Failed to flatten messages", error=str(e))
+        raise
+    finally:
+        client.close()
+
+
+async def main():
+    """Main function to run the migration."""
+    logger.info("Starting message flattening migration")
+    
+    try:
+        await flatten_messages()
+        logger.info("Message flattening completed successfully; run setup_indexes.py next")
+    except Exception as e:
+        logger.error("Message flattening failed", error=str(e))
+        return 1
+    
+    return 0
+
+
+if __name__ == "__main__":
+    import sys
+    exit_code = asyncio.run(main())
+    sys.exit(exit_code)
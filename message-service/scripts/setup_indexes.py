@@ -3,14 +3,85 @@
 
 import asyncio
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import IndexModel
 from app.core.config import settings
 from app.core.logging import get_logger
 
 logger = get_logger(__name__)
 
 
+# Index specs for the messages collection, created in a single command
+MESSAGE_INDEXES = [
+    # Unique index for message_id
+    IndexModel([("message_id", 1)], unique=True, name="idx_message_id_unique"),
+    
+    # Compound index for conversation filtering
+    IndexModel(
+        [
+            ("conversation_id", 1),
+            ("role", 1),
+            ("message_type", 1),
+            ("status", 1)
+        ],
+        name="idx_conversation_filtering"
+    ),
+    
+    # Text search index
+    IndexModel(
+        [("text", "text"), ("custom_metadata.topics", "text")],
+        name="idx_text_search",
+        weights={
+            "text": 10,
+            "custom_metadata.topics": 5
+        }
+    ),
+    
+    # Index for analytics queries
+    IndexModel(
+        [
+            ("user_id", 1),
+            ("llm_metadata.provider", 1),
+            ("llm_metadata.model", 1),
+            ("created_at", -1)
+        ],
+        name="idx_analytics_queries",
+        sparse=True
+    ),
+    
+    # Index for safety audit
+    IndexModel(
+        [
+            ("safety_metadata.content_filtered", 1),
+            ("created_at", -1)
+        ],
+        name="idx_safety_audit"
+    ),
+    
+    # Single field indexes
+    IndexModel([("conversation_id", 1)], name="idx_conversation_id"),
+    IndexModel([("user_id", 1)], name="idx_user_id"),
+    IndexModel([("status", 1)], name="idx_status"),
+    IndexModel([("role", 1)], name="idx_role"),
+]
+
+
+# Superseded by the keyset indexes the Message model declares, which init_beanie
+# creates: (conversation_id, created_at, message_id) and (user_id, created_at,
+# message_id) cover the chronological queries, and pagination is keyed on
+# message_id rather than _id
+OBSOLETE_INDEXES = [
+    "idx_conversation_chronological",
+    "idx_user_chronological",
+    "idx_temporal_pagination",
+]
+
+
 async def create_message_indexes():
-    """Create indexes for the messages collection."""
+    """Create indexes for the messages collection.
+    
+    All indexes are sent in one createIndexes command; indexes that already
+    exist with the same spec are left untouched, so re-running is cheap.
+    """
     
     # Connect to MongoDB
     client = AsyncIOMotorClient(settings.mongodb_url)
@@ -20,91 +91,18 @@ async def create_message_indexes():
     logger.info("Creating MongoDB indexes for messages collection")
     
     try:
-        # Unique index for message_id
-        await messages_collection.create_index(
-            [("message_id", 1)],
-            unique=True,
-            name="idx_message_id_unique"
-        )
-        logger.info("Created unique index for message_id")
-        
-        # Index for conversation queries (most frequent)
-        await messages_collection.create_index(
-            [("conversation_id", 1), ("timestamps.created_at", -1)],
-            name="idx_conversation_chronological"
-        )
-        logger.info("Created index for conversation queries")
-        
-        # Index for user queries
-        await messages_collection.create_index(
-            [("user_id", 1), ("timestamps.created_at", -1)],
-            name="idx_user_chronological"
-        )
-        logger.info("Created index for user queries")
-        
-        # Index for temporal pagination
-        await messages_collection.create_index(
-            [("timestamps.created_at", -1), ("_id", 1)],
-            name="idx_temporal_pagination"
-        )
-        logger.info("Created index for temporal pagination")
-        
-        # Compound index for conversation filtering
-        await messages_collection.create_index(
-            [
-                ("conversation_id", 1),
-                ("role", 1),
-                ("message_type", 1),
-                ("status", 1)
-            ],
-            name="idx_conversation_filtering"
-        )
-        logger.info("Created index for conversation filtering")
-        
-        # Text search index
-        await messages_collection.create_index(
-            [("content.text", "text"), ("custom_metadata.topics", "text")],
-            name="idx_text_search",
-            weights={
-                "content.text": 10,
-                "custom_metadata.topics": 5
-            }
-        )
-        logger.info("Created text search index")
-        
-        # Index for analytics queries
-        await messages_collection.create_index(
-            [
-                ("user_id", 1),
-                ("llm_metadata.provider", 1),
-                ("llm_metadata.model", 1),
-                ("timestamps.created_at", -1)
-            ],
-            name="idx_analytics_queries",
-            sparse=True
-        )
-        logger.info("Created index for analytics queries")
-        
-        # Index for safety audit
-        await messages_collection.create_index(
-            [
-                ("safety_metadata.content_filtered", 1),
-                ("timestamps.created_at", -1)
-            ],
-            name="idx_safety_audit"
-        )
-        logger.info("Created index for safety audit")
-        
-        # Single field indexes
-        await messages_collection.create_index([("conversation_id", 1)], name="idx_conversation_id")
-        await messages_collection.create_index([("user_id", 1)], name="idx_user_id")
-        await messages_collection.create_index([("status", 1)], name="idx_status")
-        await messages_collection.create_index([("role", 1)], name="idx_role")
+        existing = {idx["name"] async for idx in messages_collection.list_indexes()}
+        for name in OBSOLETE_INDEXES:
+            if name in existing:
+                await messages_collection.drop_index(name)
+                logger.info("Dropped obsolete index", index=name)
         
-        logger.info("Created single field indexes")
+        await messages_collection.create_indexes(MESSAGE_INDEXES)
         
         # List all indexes for verification
         indexes = await messages_collection.list_indexes().to_list(length=None)
+        created = [idx["name"] for idx in indexes if idx["name"] not in existing]
+        logger.info("Created indexes", count=len(created), names=created)
         logger.info("Current indexes in messages collection:")
         for idx in indexes:
             logger.info(f"  - {idx['name']}: {idx.get('key', {})}")
@@ -25,17 +25,23 @@ async def test_client():
         yield client
 
 
+@pytest.fixture(scope="session")
+def mongo_client():
+    """Create one MongoDB client, and so one connection pool, for the test session."""
+    client = AsyncIOMotorClient(settings.mongodb_url)
+    yield client
+    client.close()
+
+
 @pytest_asyncio.fixture
-async def test_db():
+async def test_db(mongo_client):
     """Create a test database connection."""
-    client = AsyncIOMotorClient(settings.mongodb_url)
-    db = client[f"{settings.mongodb_database}_test"]
+    db = mongo_client[f"{settings.mongodb_database}_test"]
     
     yield db
     
     # Cleanup
-    await client.drop_database(f"{settings.mongodb_database}_test")
-    client.close()
+    await mongo_client.drop_database(f"{settings.mongodb_database}_test")
 
 
 @pytest.fixture
@@ -0,0 +1,153 @@
+"""Unit tests for the LLM processing endpoints."""
+
+from datetime import datetime
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+import httpx
+import orjson
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.v1 import llm
+from app.core.config import settings
+from app.core.rate_limiter import rate_limiter
+from app.models.message import MessageResponse, MessageRole
+from app.services.message_service import message_service
+
+
+def _stored_message(**fields):
+    """Stand in for a Message returned by the repository."""
+    return SimpleNamespace(
+        message_id=f"msg_{fields['role'].value}",
+        conversation_id=fields["conversation_id"],
+        user_id=fields["user_id"],
+        character_id=fields.get("character_id"),
+        text=fields["content"],
+        role=fields["role"],
+        created_at=datetime(2025, 1, 15, 10, 0, 0),
+        llm_metadata=None,
+        custom_metadata=fields.get("metadata") or {}
+    )
+
+
+def _events(response: httpx.Response) -> list:
+    """Decode the `data:` frames of a Server-Sent Events body."""
+    return [
+        orjson.loads(frame[len("data: "):])
+        for frame in response.text.split("\n\n")
+        if frame.startswith("data: ")
+    ]
+
+
+class _BrokenStream(httpx.AsyncByteStream):
+    """Upstream SSE body that drops the connection after one delta."""
+    
+    async def __aiter__(self):
+        yield b'data: {"delta": "Hel"}\n\n'
+        raise httpx.ReadError("connection lost")
+
+
+@pytest.fixture
+def client():
+    """Create a test client for an app with only the LLM router."""
+    app = FastAPI()
+    app.include_router(llm.router)
+    with TestClient(app) as client:
+        yield client
+
+
+class TestStreamEndpoint:
+    """Test cases for /llm/process/stream."""
+    
+    @pytest.fixture
+    def stored(self):
+        """Patch out rate limiting and storage; yields the repository insert mock."""
+        user_message = MessageResponse(
+            message_id="msg_user",
+            conversation_id="conv_stream",
+            user_id="user_test_123",
+            content="Hello",
+            role=MessageRole.USER,
+            created_at=datetime(2025, 1, 15, 10, 0, 0)
+        )
+        repository = message_service.repository
+        with patch.object(rate_limiter, "check_rate_limit", AsyncMock()), \
+                patch.object(message_service, "create_message", AsyncMock(return_value=user_message)), \
+                patch.object(repository, "get_latest_message_id", AsyncMock(return_value=None)), \
+                patch.object(repository, "get_conversation_turns", AsyncMock(return_value=[])), \
+                patch.object(repository, "create_message", AsyncMock(side_effect=_stored_message)) as insert:
+            yield insert
+    
+    def _stream(self, client, handler):
+        upstream = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        with patch.object(message_service.llm_service, "client", upstream):
+            return _events(client.post(
+                "/llm/process/stream",
+                json={"content": "Hello", "conversation_id": "conv_stream"},
+                headers={"x-user-id": "user_test_123"}
+            ))
+    
+    def test_stream_completes(self, client, stored):
+        """Test that deltas are relayed and the full reply is stored."""
+        body = b'data: {"delta": "Hel"}\n\ndata: {"delta": "lo"}\n\ndata: [DONE]\n\n'
+        events = self._stream(client, lambda request: httpx.Response(200, content=body))
+        
+        assert [event["type"] for event in events] == [
+            "user_message", "delta", "delta", "assistant_message"
+        ]
+        assert events[-1]["message"]["content"] == "Hello"
+        assert stored.call_args.kwargs["metadata"]["llm_metadata"]["completed"] is True
+    
+    def test_connection_lost_mid_stream(self, client, stored):
+        """Test that a dropped upstream stream ends with an error frame."""
+        events = self._stream(client, lambda request: httpx.Response(200, stream=_BrokenStream()))
+        
+        assert [event["type"] for event in events] == ["user_message", "delta", "error"]
+        assert events[-1]["error"]["code"] == "LLM_STREAM_ERROR"
+        # The partial reply is kept, marked as incomplete
+        assert stored.call_args.kwargs["content"] == "Hel"
+        assert stored.call_args.kwargs["metadata"]["llm_metadata"]["completed"] is False
+    
+    def test_upstream_timeout(self, client, stored):
+        """Test that an upstream timeout is reported as an error frame."""
+        def handler(request):
+            raise httpx.ReadTimeout("timed out", request=request)
+        
+        events = self._stream(client, handler)
+        
+        assert [event["type"] for event in events] == ["user_message", "error"]
+        assert events[-1]["error"]["code"] == "TIMEOUT_ERROR"
+        stored.assert_not_called()
+    
+    def test_upstream_error_status(self, client, stored):
+        """Test that an upstream error response is reported as an error frame."""
+        events = self._stream(client, lambda request: httpx.Response(500, json={"detail": "boom"}))
+        
+        assert [event["type"] for event in events] == ["user_message", "error"]
+        assert events[-1]["error"]["code"] == "LLM_SERVICE_ERROR"
+        stored.assert_not_called()
+
+
+class TestProcessEndpoint:
+    """Test cases for /llm/process."""
+    
+    def test_oversized_prompt_rejected(self, client):
+        """Test that a conversation too large to send to the LLM is a 400."""
+        repository = message_service.repository
+        small_payload = settings.model_copy(update={"max_llm_payload_bytes": 100})
+        with patch.object(rate_limiter, "check_rate_limit", AsyncMock()), \
+                patch.object(repository, "build_message", _stored_message), \
+                patch.object(repository, "insert_message", AsyncMock(side_effect=lambda message: message)), \
+                patch.object(repository, "get_latest_message_id", AsyncMock(return_value=None)), \
+                patch.object(repository, "get_conversation_turns", AsyncMock(return_value=[])), \
+                patch("app.services.llm_service.settings", small_payload):
+            response = client.post(
+                "/llm/process",
+                json={"content": "x" * 200, "conversation_id": "conv_oversized"},
+                headers={"x-user-id": "user_test_123"}
+            )
+        
+        assert response.status_code == 400
+        assert response.json()["detail"]["error"]["code"] == "VALIDATION_ERROR"
@@ -0,0 +1,109 @@
+"""Unit tests for LLMService."""
+
+import asyncio
+import time
+from email.utils import formatdate
+from unittest.mock import AsyncMock, patch
+
+import httpx
+import pytest
+
+from app.core.config import settings
+from app.services.llm_service import LLMMessage, LLMService, RetryBackoff
+
+
+class TestLLMService:
+    """Test cases for LLMService."""
+    
+    @pytest.fixture
+    def upstream_calls(self):
+        """Count requests reaching a slow mock LLM service."""
+        return []
+    
+    @pytest.fixture
+    def llm_service(self, upstream_calls):
+        """Create an LLMService backed by a mock transport, with the response cache off."""
+        async def handler(request):
+            upstream_calls.append(request)
+            await asyncio.sleep(0.01)
+            return httpx.Response(200, json={"response": "Paris", "model": "test-model"})
+        
+        service = LLMService()
+        service.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        with patch("app.services.llm_service.settings", settings.model_copy(update={"llm_cache_enabled": False})):
+            yield service
+    
+    @pytest.mark.asyncio
+    async def test_identical_deterministic_requests_coalesced(self, llm_service, upstream_calls):
+        """Test that concurrent identical requests at temperature 0 share one upstream call."""
+        messages = [LLMMessage("user", "Capital of France?")]
+        
+        responses = await asyncio.gather(*[
+            llm_service.send_message(messages, temperature=0.0) for _ in range(3)
+        ])
+        
+        assert len(upstream_calls) == 1
+        assert all(response.response == "Paris" for response in responses)
+    
+    @pytest.mark.asyncio
+    async def test_sampled_requests_not_coalesced(self, llm_service, upstream_calls):
+        """Test that identical requests at a non-zero temperature each get their own call."""
+        messages = [LLMMessage("user", "Capital of France?")]
+        
+        await asyncio.gather(*[
+            llm_service.send_message(messages, temperature=0.7) for _ in range(3)
+        ])
+        
+        assert len(upstream_calls) == 3
+    
+    @pytest.mark.asyncio
+    async def test_rate_limited_request_waits_retry_after(self, llm_service):
+        """Test that a 429 is retried no sooner than its Retry-After."""
+        responses = iter([
+            httpx.Response(429, headers={"Retry-After": "12"}),
+            httpx.Response(200, json={"response": "Paris", "model": "test-model"})
+        ])
+        llm_service.client = httpx.AsyncClient(transport=httpx.MockTransport(lambda request: next(responses)))
+        
+        with patch("app.services.llm_service.asyncio.sleep", AsyncMock()) as sleep:
+            response = await llm_service.send_message([LLMMessage("user", "Capital of France?")])
+        
+        assert response.response == "Paris"
+        assert sleep.await_args.args[0] >= 12.0
+
+
+class TestRetryBackoff:
+    """Test cases for RetryBackoff."""
+    
+    def test_delay_jitter_bounds(self):
+        """Test that delays are the exponential step scaled into [0.5, 1.5)."""
+        backoff = RetryBackoff(base_delay=1.0, max_delay=30.0)
+        
+        for attempt, step in [(0, 1.0), (2, 4.0), (10, 30.0)]:
+            delays = [backoff.delay(attempt) for _ in range(200)]
+            assert all(0.5 * step <= delay < 1.5 * step for delay in delays)
+            # Jittered, not a fixed schedule
+            assert len(set(delays)) > 1
+    
+    def test_delay_honours_retry_after(self):
+        """Test that a Retry-After longer than the backoff is waited out."""
+        backoff = RetryBackoff(base_delay=1.0, max_delay=30.0)
+        
+        assert backoff.delay(0, retry_after=20.0) == 20.0
+    
+    def test_retry_after_seconds(self):
+        """Test parsing Retry-After given in seconds."""
+        response = httpx.Response(429, headers={"Retry-After": "7"})
+        
+        assert RetryBackoff.retry_after(response) == 7.0
+    
+    def test_retry_after_http_date(self):
+        """Test parsing Retry-After given as an HTTP date."""
+        response = httpx.Response(429, headers={"Retry-After": formatdate(time.time() + 60, usegmt=True)})
+        
+        assert 55.0 <= RetryBackoff.retry_after(response) <= 60.0
+    
+    def test_retry_after_missing_or_invalid(self):
+        """Test that a missing or unparseable Retry-After is ignored."""
+        assert RetryBackoff.retry_after(httpx.Response(429)) is None
+        assert RetryBackoff.retry_after(httpx.Response(429, headers={"Retry-After": "soon"})) is None
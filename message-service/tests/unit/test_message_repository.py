@@ -0,0 +1,93 @@
+"""Unit tests for MessageRepository."""
+
+from datetime import datetime, timedelta
+
+import pytest
+from beanie import init_beanie
+from mongomock_motor import AsyncMongoMockClient
+
+from app.core.exceptions import ValidationError
+from app.models.database import Message, MessageSummary
+from app.repositories.message_repository import MessageRepository
+
+
+class TestConversationPagination:
+    """Test cases for keyset pagination of conversation messages."""
+    
+    @pytest.fixture
+    def repository(self, event_loop):
+        """Create a MessageRepository over an in-memory MongoDB with five messages.
+        
+        The two newest messages share a creation time, so their order is
+        decided by message_id.
+        """
+        client = AsyncMongoMockClient()
+        event_loop.run_until_complete(
+            init_beanie(database=client["message_service_test"], document_models=[Message])
+        )
+        
+        start = datetime(2025, 1, 15, 10, 0, 0)
+        created = [start, start + timedelta(seconds=1), start + timedelta(seconds=2)] + [start + timedelta(seconds=3)] * 2
+        repository = MessageRepository()
+        for i, created_at in enumerate(created):
+            message = repository.build_message(
+                conversation_id="conv_pages",
+                user_id="user_test_123",
+                content=f"Message {i}"
+            )
+            message.message_id = f"msg_{i}"
+            message.created_at = created_at
+            event_loop.run_until_complete(repository.insert_message(message))
+        return repository
+    
+    @pytest.mark.asyncio
+    async def test_pages_follow_cursor(self, repository):
+        """Test that following next_cursor walks every message once, newest first."""
+        first, cursor = await repository.get_conversation_messages("conv_pages", limit=2)
+        second, cursor = await repository.get_conversation_messages("conv_pages", limit=2, cursor=cursor)
+        third, cursor = await repository.get_conversation_messages("conv_pages", limit=2, cursor=cursor)
+        
+        assert [message.message_id for message in first] == ["msg_4", "msg_3"]
+        assert [message.message_id for message in second] == ["msg_2", "msg_1"]
+        assert [message.message_id for message in third] == ["msg_0"]
+        assert cursor is None
+    
+    @pytest.mark.asyncio
+    async def test_full_last_page_has_no_cursor(self, repository):
+        """Test that a last page exactly `limit` long does not offer another page."""
+        page, cursor = await repository.get_conversation_messages("conv_pages", limit=5)
+        
+        assert len(page) == 5
+        assert cursor is None
+    
+    @pytest.mark.asyncio
+    async def test_projected_pages_follow_cursor(self, repository):
+        """Test that cursors are built from projected messages too."""
+        first, cursor = await repository.get_conversation_messages(
+            "conv_pages", limit=3, projection_model=MessageSummary
+        )
+        second, cursor = await repository.get_conversation_messages(
+            "conv_pages", limit=3, cursor=cursor, projection_model=MessageSummary
+        )
+        
+        assert [message.message_id for message in first + second] == [
+            "msg_4", "msg_3", "msg_2", "msg_1", "msg_0"
+        ]
+        assert cursor is None
+    
+    @pytest.mark.asyncio
+    async def test_user_pages_follow_cursor(self, repository):
+        """Test that user message pages resume from their cursor."""
+        first, cursor = await repository.get_user_messages("user_test_123", limit=4)
+        second, cursor = await repository.get_user_messages("user_test_123", limit=4, cursor=cursor)
+        
+        assert [message.message_id for message in first + second] == [
+            "msg_4", "msg_3", "msg_2", "msg_1", "msg_0"
+        ]
+        assert cursor is None
+    
+    @pytest.mark.asyncio
+    async def test_malformed_cursor_rejected(self, repository):
+        """Test that a cursor not produced by the repository is a validation error."""
+        with pytest.raises(ValidationError):
+            await repository.get_conversation_messages("conv_pages", cursor="not-a-cursor")
@@ -1,19 +1,33 @@
 """Unit tests for MessageService."""
 
+import bleach
 import pytest
+from pydantic import ValidationError as PydanticValidationError
+from datetime import datetime
+from types import SimpleNamespace
 from unittest.mock import AsyncMock, patch
 
-from app.services.message_service import MessageService
-from app.models.message import CreateMessageRequest, MessageRole
-from app.core.exceptions import ValidationError
+from app.services.message_service import (
+    ConversationHistory,
+    MessageService,
+    _needs_bleach,
+    conversation_history
+)
+from app.services.llm_service import LLMMessage
+from app.models.message import CreateMessageRequest, MessageResponse, MessageRole
+from app.core.exceptions import DatabaseError, ValidationError
 
 
 class TestMessageService:
     """Test cases for MessageService."""
     
-    @pytest.fixture
+    @pytest.fixture(scope="module")
     def message_service(self):
-        """Create MessageService instance."""
+        """Create one MessageService shared by the module's tests.
+        
+        The service holds no per-test state; tests patch its repository
+        within their own scope.
+        """
         return MessageService()
     
     @pytest.mark.asyncio
@@ -31,10 +45,10 @@ class TestMessageService:
             mock_message.message_id = "msg_test_123"
             mock_message.conversation_id = "conv_test_123"
             mock_message.user_id = "user_test_123"
-            mock_message.content = {"text": "Test message content"}
+            mock_message.text = "Test message content"
             mock_message.role = "user"
             mock_message.status = "active"
-            mock_message.timestamps = {"created_at": "2025-01-15T10:00:00Z"}
+            mock_message.created_at = "2025-01-15T10:00:00Z"
             mock_message.custom_metadata = {"test": True}
             
             mock_create.return_value = mock_message
@@ -66,4 +80,229 @@ class TestMessageService:
         
         assert "<script>" not in sanitized
         assert "<b>" not in sanitized
-        assert "Hello world" in sanitized
\ No newline at end of file
+        assert "Hello world" in sanitized
+    
+    @pytest.mark.parametrize("content", [
+        "if x<3 and y>2 then",
+        "a < b and c > d",
+        "x <= 10 && y >= 2",
+        "I <3 you >:)",
+        "</3 <:-) >_<",
+        "Tom & Jerry",
+        "&lt;b&gt;hi",
+        "x &amp; y",
+        "&nbsp;&copy &#39;q&#x27; &foo;",
+        "<b>bold</b> and <i>italic</i>",
+        "<!-- note -->text",
+        "tab\tand\r\nnewline",
+        "bell\x07 and nul\x00"
+    ])
+    def test_sanitize_content_matches_bleach(self, message_service, content):
+        """The escaping fast path and the bleach path agree with bleach."""
+        expected = " ".join(bleach.clean(content, tags=[], attributes={}, strip=True).split())
+        
+        assert message_service._sanitize_content(content) == expected
+    
+    @pytest.mark.parametrize("content", [
+        "if x<3 and y>2 then",
+        "I <3 you >:)",
+        "a < b and c > d",
+        "Tom & Jerry"
+    ])
+    def test_plain_text_skips_bleach(self, content):
+        """Comparisons, emoticons and bare ampersands take the fast path."""
+        assert not _needs_bleach(content)
+
+    
+    @pytest.mark.asyncio
+    async def test_stale_history_is_reloaded(self, message_service):
+        """Test that a buffered history is read again once another worker writes."""
+        conversation_history.load("conv_stale", [("msg_1", LLMMessage("user", "Hi"))])
+        user_message = MessageResponse(
+            message_id="msg_3",
+            conversation_id="conv_stale",
+            user_id="user_test_123",
+            content="Still there?",
+            role=MessageRole.USER,
+            created_at=datetime(2025, 1, 15, 10, 0, 0)
+        )
+        turns = [
+            {"message_id": "msg_2", "role": "assistant", "text": "Hello from another worker"},
+            {"message_id": "msg_1", "role": "user", "text": "Hi"}
+        ]
+        request = CreateMessageRequest(conversation_id="conv_stale", content="Still there?")
+        
+        repository = message_service.repository
+        with patch.object(repository, "get_latest_message_id", AsyncMock(return_value="msg_2")), \
+                patch.object(repository, "get_conversation_turns", AsyncMock(return_value=turns)):
+            llm_messages = await message_service._build_llm_messages(request, user_message)
+        
+        assert [message.content for message in llm_messages[1:]] == [
+            "Hi", "Hello from another worker", "Still there?"
+        ]
+        assert [message_id for message_id, _ in conversation_history.get("conv_stale")] == [
+            "msg_1", "msg_2", "msg_3"
+        ]
+    
+    @pytest.mark.asyncio
+    async def test_current_history_is_reused(self, message_service):
+        """Test that a buffered history holding the newest stored message is not read again."""
+        conversation_history.load("conv_current", [("msg_1", LLMMessage("user", "Hi"))])
+        user_message = MessageResponse(
+            message_id="msg_2",
+            conversation_id="conv_current",
+            user_id="user_test_123",
+            content="Again",
+            role=MessageRole.USER,
+            created_at=datetime(2025, 1, 15, 10, 0, 0)
+        )
+        request = CreateMessageRequest(conversation_id="conv_current", content="Again")
+        
+        repository = message_service.repository
+        with patch.object(repository, "get_latest_message_id", AsyncMock(return_value="msg_1")), \
+                patch.object(repository, "get_conversation_turns", AsyncMock()) as read:
+            llm_messages = await message_service._build_llm_messages(request, user_message)
+        
+        read.assert_not_called()
+        assert [message.content for message in llm_messages[1:]] == ["Hi", "Again"]
+
+    
+    @pytest.mark.asyncio
+    async def test_failed_insert_forgets_message(self, message_service):
+        """Test that a failed write drops the buffered history."""
+        message = SimpleNamespace(message_id="msg_lost", conversation_id="conv_lost")
+        conversation_history.load("conv_lost", [("msg_lost", LLMMessage("assistant", "Lost reply"))])
+        
+        failure = AsyncMock(side_effect=DatabaseError("create_message"))
+        with patch.object(message_service.repository, "insert_message", failure):
+            with pytest.raises(DatabaseError):
+                await message_service._insert_message(message)
+        
+        assert conversation_history.get("conv_lost") is None
+    
+    @pytest.mark.asyncio
+    async def test_failed_user_insert_skips_llm(self, message_service):
+        """Test that a failed user message insert fails the request before the LLM call."""
+        conversation_history.load("conv_unsaved", [("msg_1", LLMMessage("user", "Hi"))])
+        request = CreateMessageRequest(conversation_id="conv_unsaved", content="Lost question")
+        
+        def build_message(**fields):
+            return SimpleNamespace(
+                message_id="msg_unsaved",
+                conversation_id=fields["conversation_id"],
+                user_id=fields["user_id"],
+                character_id=fields.get("character_id"),
+                text=fields["content"],
+                role=fields["role"],
+                created_at=datetime(2025, 1, 15, 10, 0, 0),
+                llm_metadata=None,
+                custom_metadata=fields.get("metadata") or {}
+            )
+        
+        repository = message_service.repository
+        with patch.object(repository, "build_message", build_message), \
+                patch.object(repository, "insert_message", AsyncMock(side_effect=DatabaseError("create_message"))), \
+                patch.object(repository, "get_latest_message_id", AsyncMock(return_value="msg_1")), \
+                patch.object(message_service.llm_service, "send_message", AsyncMock()) as send:
+            with pytest.raises(DatabaseError):
+                await message_service.process_message_with_llm(request, "user_test_123")
+        
+        send.assert_not_called()
+        assert conversation_history.get("conv_unsaved") is None
+    
+    @pytest.mark.parametrize("llm_metadata", [None, {}, {"model": "test-model"}])
+    def test_response_conversions_agree(self, message_service, llm_metadata):
+        """Test that single and batch conversion serialize a message identically."""
+        message = SimpleNamespace(
+            message_id="msg_convert",
+            conversation_id="conv_convert",
+            user_id="user_test_123",
+            character_id=None,
+            text="Hello",
+            role=MessageRole.ASSISTANT,
+            created_at=datetime(2025, 1, 15, 10, 0, 0),
+            llm_metadata=llm_metadata,
+            custom_metadata={}
+        )
+        
+        single = message_service._to_response_model(message)
+        [batched] = message_service._to_response_models([message])
+        
+        assert single.model_dump() == batched.model_dump()
+
+
+class TestConversationHistory:
+    """Test cases for ConversationHistory."""
+    
+    @pytest.fixture
+    def history(self):
+        """Create a small ConversationHistory."""
+        return ConversationHistory(max_conversations=2, max_messages=4, trim_messages=2)
+    
+    @staticmethod
+    def _messages(count):
+        return [(f"msg_{i}", LLMMessage("user", f"text {i}")) for i in range(count)]
+    
+    def test_append_requires_loaded_conversation(self, history):
+        """Test that appending to an unloaded conversation does not create a partial history."""
+        history.append("conv_a", "msg_0", LLMMessage("user", "Hi"))
+        
+        assert history.get("conv_a") is None
+    
+    def test_append_to_loaded_conversation(self, history):
+        """Test that appended messages follow the loaded history."""
+        history.load("conv_a", self._messages(1))
+        history.append("conv_a", "msg_1", LLMMessage("assistant", "Hello"))
+        
+        assert [message_id for message_id, _ in history.get("conv_a")] == ["msg_0", "msg_1"]
+    
+    def test_trim_drops_a_block(self, history):
+        """Test that a full history drops trim_messages of its oldest messages at once."""
+        history.load("conv_a", self._messages(4))
+        history.append("conv_a", "msg_4", LLMMessage("user", "text 4"))
+        
+        assert [message_id for message_id, _ in history.get("conv_a")] == ["msg_2", "msg_3", "msg_4"]
+    
+    def test_load_trims_to_cap(self, history):
+        """Test that loading more than max_messages keeps the newest ones."""
+        history.load("conv_a", self._messages(7))
+        
+        assert [message_id for message_id, _ in history.get("conv_a")] == ["msg_3", "msg_4", "msg_5", "msg_6"]
+    
+    def test_discard(self, history):
+        """Test that a discarded conversation is no longer served."""
+        history.load("conv_a", self._messages(2))
+        history.discard("conv_a")
+        
+        assert history.get("conv_a") is None
+    
+    def test_least_recently_used_conversation_evicted(self, history):
+        """Test that conversations are capped in LRU order."""
+        history.load("conv_a", self._messages(1))
+        history.load("conv_b", self._messages(1))
+        history.get("conv_a")
+        history.load("conv_c", self._messages(1))
+        
+        assert history.get("conv_b") is None
+        assert history.get("conv_a") is not None
+
+
+class TestCreateMessageRequest:
+    """Test cases for CreateMessageRequest."""
+    
+    def test_content_stripped(self):
+        """Test that content is stripped while identifiers are kept as sent."""
+        request = CreateMessageRequest(
+            conversation_id=" conv_test_123 ",
+            content="  Hello  ",
+            client_msg_id="client-1\t"
+        )
+        
+        assert request.content == "Hello"
+        assert request.conversation_id == " conv_test_123 "
+        assert request.client_msg_id == "client-1\t"
+    
+    def test_blank_content_rejected(self):
+        """Test that whitespace-only content fails the length check."""
+        with pytest.raises(PydanticValidationError):
+            CreateMessageRequest(conversation_id="conv_test_123", content=" \n\t ")
@@ -0,0 +1,149 @@
+"""Unit tests for the rate limiters."""
+
+import time
+import fakeredis
+import pytest
+from unittest.mock import AsyncMock, patch
+
+from app.core.rate_limiter import InMemoryRateLimiter, RedisRateLimiter
+from app.core.redis_client import LIMITED_INCR_SCRIPT, redis_client
+from app.core.config import MAX_MESSAGES_PER_HOUR, MAX_MESSAGES_PER_MINUTE
+from app.core.exceptions import RateLimitExceeded, RedisError
+
+
+class TestInMemoryRateLimiter:
+    """Test cases for InMemoryRateLimiter."""
+    
+    @pytest.fixture
+    def rate_limiter(self):
+        """Create InMemoryRateLimiter instance."""
+        return InMemoryRateLimiter()
+    
+    @pytest.mark.asyncio
+    async def test_minute_limit_exceeded(self, rate_limiter):
+        """Test that exceeding the per-minute limit raises."""
+        with patch("app.core.rate_limiter.MAX_MESSAGES_PER_MINUTE", 2):
+            await rate_limiter.check_rate_limit("user_test_123")
+            await rate_limiter.check_rate_limit("user_test_123")
+            
+            with pytest.raises(RateLimitExceeded) as exc_info:
+                await rate_limiter.check_rate_limit("user_test_123")
+        
+        assert exc_info.value.details["limit_type"] == "messages_per_minute"
+        assert exc_info.value.details["current"] == 2
+    
+    @pytest.mark.asyncio
+    async def test_expired_requests_are_cleaned(self, rate_limiter):
+        """Test that requests older than a window no longer count against it."""
+        await rate_limiter.check_rate_limit("user_test_123")
+        
+        user_data = rate_limiter._user_requests["user_test_123"]
+        rate_limiter._clean_old_requests(user_data, time.monotonic() + 120)
+        
+        assert len(user_data["minute"]) == 0
+        assert len(user_data["hour"]) == 1
+        assert len(user_data["day"]) == 1
+    
+    @pytest.mark.asyncio
+    async def test_rate_limit_info(self, rate_limiter):
+        """Test remaining quota reporting."""
+        await rate_limiter.check_rate_limit("user_test_123")
+        
+        info = await rate_limiter.get_rate_limit_info("user_test_123")
+        
+        assert info["minute_remaining"] == MAX_MESSAGES_PER_MINUTE - 1
+    
+    @pytest.mark.asyncio
+    async def test_least_recently_seen_user_evicted(self):
+        """Test that tracked users are capped in LRU order."""
+        rate_limiter = InMemoryRateLimiter(max_users=2)
+        
+        await rate_limiter.check_rate_limit("user_a")
+        await rate_limiter.check_rate_limit("user_b")
+        await rate_limiter.check_rate_limit("user_a")
+        await rate_limiter.check_rate_limit("user_c")
+        
+        assert list(rate_limiter._user_requests) == ["user_a", "user_c"]
+    
+    @pytest.mark.asyncio
+    async def test_idle_users_swept(self):
+        """Test that users idle for a day are dropped on sweep."""
+        rate_limiter = InMemoryRateLimiter(sweep_interval=2)
+        
+        await rate_limiter.check_rate_limit("user_a")
+        rate_limiter._user_requests["user_a"]["day"][0] -= 86401
+        await rate_limiter.check_rate_limit("user_b")
+        
+        assert list(rate_limiter._user_requests) == ["user_b"]
+
+
+class TestRedisRateLimiter:
+    """Test cases for RedisRateLimiter."""
+    
+    @pytest.fixture
+    def redis(self):
+        """Point the shared Redis client at an in-memory server."""
+        client = fakeredis.FakeAsyncRedis()
+        with patch.object(redis_client, "_client", client), \
+                patch.object(redis_client, "_limited_incr", client.register_script(LIMITED_INCR_SCRIPT)):
+            yield client
+    
+    @pytest.fixture
+    def rate_limiter(self, redis):
+        """Create RedisRateLimiter instance."""
+        return RedisRateLimiter()
+    
+    @pytest.mark.asyncio
+    async def test_minute_limit_exceeded(self, rate_limiter):
+        """Test that exceeding the per-minute limit raises."""
+        with patch("app.core.rate_limiter.MAX_MESSAGES_PER_MINUTE", 2):
+            await rate_limiter.check_rate_limit("user_test_123")
+            await rate_limiter.check_rate_limit("user_test_123")
+            
+            with pytest.raises(RateLimitExceeded) as exc_info:
+                await rate_limiter.check_rate_limit("user_test_123")
+        
+        assert exc_info.value.details["limit_type"] == "messages_per_minute"
+        assert exc_info.value.details["limit"] == 2
+        assert exc_info.value.details["current"] == 2
+    
+    @pytest.mark.asyncio
+    async def test_rejected_requests_not_counted(self, rate_limiter):
+        """Test that rejected requests do not use up the hour and day quotas."""
+        with patch("app.core.rate_limiter.MAX_MESSAGES_PER_MINUTE", 1):
+            await rate_limiter.check_rate_limit("user_test_123")
+            for _ in range(3):
+                with pytest.raises(RateLimitExceeded):
+                    await rate_limiter.check_rate_limit("user_test_123")
+        
+        info = await rate_limiter.get_rate_limit_info("user_test_123")
+        
+        assert info["hour_remaining"] == MAX_MESSAGES_PER_HOUR - 1
+    
+    @pytest.mark.asyncio
+    async def test_reset_time_from_window_ttl(self, rate_limiter, redis):
+        """Test that reset_time is when the exceeded window's counter expires."""
+        with patch("app.core.rate_limiter.MAX_MESSAGES_PER_MINUTE", 1):
+            await rate_limiter.check_rate_limit("user_test_123")
+            await redis.expire("rl:user_test_123:m", 10)
+            
+            with pytest.raises(RateLimitExceeded) as exc_info:
+                await rate_limiter.check_rate_limit("user_test_123")
+        
+        assert exc_info.value.details["reset_time"] - int(time.time()) <= 10
+    
+    @pytest.mark.asyncio
+    async def test_rate_limit_info(self, rate_limiter):
+        """Test remaining quota reporting."""
+        await rate_limiter.check_rate_limit("user_test_123")
+        
+        info = await rate_limiter.get_rate_limit_info("user_test_123")
+        
+        assert info["minute_remaining"] == MAX_MESSAGES_PER_MINUTE - 1
+    
+    @pytest.mark.asyncio
+    async def test_redis_unavailable_fails_open(self, rate_limiter):
+        """Test that requests are allowed when Redis cannot be reached."""
+        failure = AsyncMock(side_effect=RedisError("increment_within_limits"))
+        with patch.object(redis_client, "increment_within_limits", failure):
+            await rate_limiter.check_rate_limit("user_test_123")